@@ -1,5 +1,7 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from itertools import repeat
+from typing import List, Tuple
 
 
 class AbstractFactory(ABC):
@@ -19,6 +21,15 @@ class AbstractFactory(ABC):
     def create_product_b(self) -> AbstractProductB:
         pass
 
+    def create_family_batch(self, n: int) -> Tuple[List[AbstractProductA], List[AbstractProductB]]:
+        """
+        n products of every kind of the family, in one call. products[0][i] and
+        products[1][i] come from the same factory, so they are compatible,
+        like a pair from create_product_a() and create_product_b().
+        """
+        create_product_a, create_product_b = self.create_product_a, self.create_product_b
+        return [create_product_a() for _ in repeat(None, n)], [create_product_b() for _ in repeat(None, n)]
+
 
 class ConcreteFactory1(AbstractFactory):
     """
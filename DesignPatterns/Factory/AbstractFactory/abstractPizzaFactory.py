@@ -1,5 +1,7 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from itertools import repeat
+from typing import List, Tuple
 
 
 class AbstractFactory(ABC):
@@ -19,6 +21,15 @@ class AbstractFactory(ABC):
     def create_calzone(self) -> AbstractCalzone:
         pass
 
+    def create_family_batch(self, n: int) -> Tuple[List[AbstractPizza], List[AbstractCalzone]]:
+        """
+        n products of every kind of the family, in one call. products[0][i] and
+        products[1][i] come from the same factory, so they are compatible,
+        like a pair from create_pizza() and create_calzone().
+        """
+        create_pizza, create_calzone = self.create_pizza, self.create_calzone
+        return [create_pizza() for _ in repeat(None, n)], [create_calzone() for _ in repeat(None, n)]
+
 
 class NeapolitanFactory(AbstractFactory):
     """
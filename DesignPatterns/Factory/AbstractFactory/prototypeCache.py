@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import copy
+import sys
+import time
+from collections import OrderedDict
+from time import perf_counter
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from abstractPizzaFactory import (AbstractCalzone, AbstractFactory, AbstractPizza, NeapolitanCalzone,
+                                  NeapolitanFactory, NeapolitanPizza, RomanFactory, client_code)
+
+
+class PrototypeCache:
+    """
+    Keeps one warm prototype per (factory, product) and hands out copies of it,
+    so the factory only builds a product again when its prototype is gone:
+    - expired: it was built more than ttl seconds ago (ttl=None: never expires)
+    - evicted: more than maxsize prototypes are cached, the least recently used goes
+    - invalidated by hand, when the recipes or prices behind it changed
+
+    Copies are shallow (copy.copy): cheap, but whatever the prototype refers to
+    (a recipe, a pricing table) is shared by every copy, so it must be treated as
+    read-only. Give copier=copy.deepcopy for products that are changed after creation.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None,
+                 copier: Callable[[Any], Any] = copy.copy,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copier = copier
+        self.clock = clock
+        self._prototypes: OrderedDict[Tuple[Hashable, str], Tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(factory: AbstractFactory, product: str) -> Tuple[Hashable, str]:
+        # Factories have no state of their own: all the instances of a class make the same products
+        return type(factory), product
+
+    def get(self, factory: AbstractFactory, product: str) -> Any:
+        """A copy of what getattr(factory, product)() would return"""
+        key = self.key(factory, product)
+        entry = self._prototypes.get(key)
+        if entry is not None:
+            prototype, built = entry
+            if self.ttl is None or self.clock() - built < self.ttl:
+                self._prototypes.move_to_end(key)
+                self.hits += 1
+                return self.copier(prototype)
+            self.expired += 1
+            del self._prototypes[key]
+
+        self.misses += 1
+        prototype = getattr(factory, product)()
+        self._prototypes[key] = (prototype, self.clock())
+        if len(self._prototypes) > self.maxsize:
+            self._prototypes.popitem(last=False)
+            self.evicted += 1
+        return self.copier(prototype)
+
+    def invalidate(self, factory: Optional[AbstractFactory] = None, product: Optional[str] = None) -> int:
+        """
+        Forget the prototypes of a factory, of a product, of both, or (without
+        arguments) all of them. Returns how many were forgotten.
+        """
+        if factory is None and product is None:
+            forgotten = len(self._prototypes)
+            self._prototypes.clear()
+            return forgotten
+        doomed = [
+            key for key in self._prototypes
+            if (factory is None or key[0] is type(factory)) and (product is None or key[1] == product)
+        ]
+        for key in doomed:
+            del self._prototypes[key]
+        return len(doomed)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._prototypes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+class CachingFactory(AbstractFactory):
+    """
+    An AbstractFactory in front of another one: the client code cannot tell the
+    difference, but the products come from a PrototypeCache. Several
+    CachingFactory objects can share one cache.
+    """
+
+    def __init__(self, factory: AbstractFactory, cache: Optional[PrototypeCache] = None) -> None:
+        self.factory = factory
+        self.cache = PrototypeCache() if cache is None else cache
+
+    def create_pizza(self) -> AbstractPizza:
+        return self.cache.get(self.factory, "create_pizza")
+
+    def create_calzone(self) -> AbstractCalzone:
+        return self.cache.get(self.factory, "create_calzone")
+
+    def invalidate(self) -> int:
+        return self.cache.invalidate(self.factory)
+
+
+"""
+In a real deployment, building a product means loading its recipe and pricing
+tables. These products pretend to do so.
+"""
+
+
+class RecipePizza(NeapolitanPizza):
+    def __init__(self) -> None:
+        time.sleep(0.002)  # reading the recipe
+        self.recipe = {"flour": "00", "hydration": 0.6, "proofing_hours": 24}
+        self.prices = {size: 6 + 2 * i for i, size in enumerate(("small", "medium", "large"))}
+
+
+class RecipeCalzone(NeapolitanCalzone):
+    def __init__(self) -> None:
+        time.sleep(0.002)
+        self.recipe = {"filling": ["ricotta", "salami"], "folded": True}
+
+
+class RecipeFactory(NeapolitanFactory):
+    def create_pizza(self) -> AbstractPizza:
+        return RecipePizza()
+
+    def create_calzone(self) -> AbstractCalzone:
+        return RecipeCalzone()
+
+
+def benchmark(orders: int = 2_000) -> None:
+    factory = RecipeFactory()
+    start = perf_counter()
+    for _ in range(orders):
+        factory.create_pizza()
+    uncached = perf_counter() - start
+
+    cached = CachingFactory(factory, PrototypeCache(ttl=60))
+    start = perf_counter()
+    for _ in range(orders):
+        cached.create_pizza()
+    elapsed = perf_counter() - start
+    print(f"{orders} pizzas: {orders / uncached:,.0f}/s built every time, {orders / elapsed:,.0f}/s from the cache "
+          f"{cached.cache.stats()}")
+
+
+if __name__ == "__main__":
+    now = [0.0]
+    cache = PrototypeCache(maxsize=3, ttl=10, clock=lambda: now[0])
+    neapolitan = CachingFactory(RecipeFactory(), cache)
+    roman = CachingFactory(RomanFactory(), cache)
+
+    print("Client: the client code does not know its factory caches:")
+    client_code(neapolitan)
+    print("\n")
+
+    first, second = neapolitan.create_pizza(), neapolitan.create_pizza()
+    print(f"Two different pizzas: {first is not second}, sharing one recipe: {first.recipe is second.recipe}")
+
+    roman.create_pizza()
+    roman.create_calzone()  # a 4th prototype: the least recently used one goes
+    print(f"Cache: {cache.stats()}")
+
+    now[0] += 11
+    neapolitan.create_pizza()  # too old, built again
+    print(f"After 11 seconds: {cache.stats()}")
+
+    print(f"The recipes changed, forgot {neapolitan.invalidate()} Neapolitan prototype(s): {cache.stats()}")
+
+    # python prototypeCache.py bench [number of orders]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
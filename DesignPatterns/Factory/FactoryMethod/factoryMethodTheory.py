@@ -1,5 +1,8 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from itertools import repeat
+from operator import methodcaller
+from typing import List
 
 
 class Creator(ABC):
@@ -34,6 +37,22 @@ class Creator(ABC):
 
         return result
 
+    def create_many(self, n: int) -> List[Product]:
+        """
+        n products in one call. The factory method is looked up once, not once
+        per product, and the list is built in one go instead of appended to.
+        """
+        factory_method = self.factory_method
+        return [factory_method() for _ in repeat(None, n)]
+
+    def some_operation_batch(self, n: int) -> List[str]:
+        """
+        The same business logic as some_operation(), for n products at once:
+        the text around the product's result is formatted once for the whole batch.
+        """
+        prefix = "Creator: The same creator's code has just worked with "
+        return list(map(prefix.__add__, map(methodcaller("operation"), self.create_many(n))))
+
 
 """
 Concrete Creators override the factory method in order to change the resulting
@@ -100,4 +119,8 @@ if __name__ == "__main__":
     print("\n")
 
     print("App: Launched with the ConcreteCreator2.")
-    client_code(ConcreteCreator2())
\ No newline at end of file
+    client_code(ConcreteCreator2())
+    print("\n")
+
+    print("App: A batch of 3 with the ConcreteCreator1.")
+    print("\n".join(ConcreteCreator1().some_operation_batch(3)))
\ No newline at end of file
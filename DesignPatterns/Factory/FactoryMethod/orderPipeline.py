@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import math
+import random
+import sys
+import time
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Union
+
+from pizzaFactory import Pizza, PizzaCreator, PizzaMarinaraCreator, PizzaMargheritaCreator
+
+
+class Order:
+    __slots__ = ("number", "product", "submitted", "done", "result", "error")
+
+    def __init__(self, number: int, product: str) -> None:
+        self.number = number
+        self.product = product
+        self.submitted = 0.0
+        self.done = 0.0
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class Report:
+    """
+    What came out of the pipeline. Latencies go from the moment an order was
+    offered to the pipeline (so waiting for room in a full queue counts) to the
+    moment its pizza was eaten.
+    """
+
+    def __init__(self, completed: List[Order], failed: List[Order], elapsed: float) -> None:
+        self.completed = completed
+        self.failed = failed  # each with its error
+        self.elapsed = elapsed
+        self._latencies = sorted(order.done - order.submitted for order in completed)
+
+    @property
+    def throughput(self) -> float:
+        return len(self.completed) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Nearest rank: the latency p percent of the orders did not exceed"""
+        if not self._latencies:
+            return 0.0
+        rank = max(0, min(len(self._latencies) - 1, math.ceil(p / 100 * len(self._latencies)) - 1))
+        return self._latencies[rank]
+
+    def __str__(self) -> str:
+        return (f"{len(self.completed)} orders ({len(self.failed)} failed) in {self.elapsed:.2f} s: "
+                f"{self.throughput:,.0f} orders/s, latency p50 {self.percentile(50) * 1000:.1f} ms, "
+                f"p95 {self.percentile(95) * 1000:.1f} ms, p99 {self.percentile(99) * 1000:.1f} ms")
+
+
+class OrderPipeline:
+    """
+    client_code(creator) handles one order, synchronously. The pipeline takes a
+    stream of orders and sends each one to the PizzaCreator of its product:
+    - every creator has its own workers (concurrency: one number for all, or a
+      dict product -> number), so a slow product does not hold up the others
+    - _bake() may be a coroutine (baking is waiting for the oven): it is awaited.
+      A plain _bake() works too: it may block, so it runs in the default executor
+      (a thread), where it does not hold up the creators of the other products.
+    - every creator has a bounded queue: when its workers cannot keep up, run()
+      waits for room before taking the next order from the stream (back-pressure),
+      instead of piling up orders in memory
+    """
+
+    def __init__(self, creators: Dict[str, Union[PizzaCreator, OvenCreator]],
+                 concurrency: Union[int, Dict[str, int]] = 1, queue_size: int = 64) -> None:
+        self.creators = dict(creators)
+        if isinstance(concurrency, int):
+            concurrency = dict.fromkeys(self.creators, concurrency)
+        self.concurrency = {name: concurrency.get(name, 1) for name in self.creators}
+        self.queue_size = queue_size
+
+    async def _worker(self, creator: Union[PizzaCreator, OvenCreator], queue: asyncio.Queue,
+                      completed: List[Order], failed: List[Order]) -> None:
+        bake = creator._bake
+        blocking = not inspect.iscoroutinefunction(bake)
+        loop = asyncio.get_running_loop()
+        while True:
+            order = await queue.get()
+            try:
+                pizza = await (loop.run_in_executor(None, bake) if blocking else bake())
+                order.result = pizza.eat_pizza()
+                order.done = time.perf_counter()
+                completed.append(order)
+            except Exception as error:
+                order.error = error
+                failed.append(order)
+            finally:
+                queue.task_done()
+
+    async def run(self, orders: Union[Iterable[Order], AsyncIterable[Order]]) -> Report:
+        queues = {name: asyncio.Queue(self.queue_size) for name in self.creators}
+        completed: List[Order] = []
+        failed: List[Order] = []
+        workers = [
+            asyncio.ensure_future(self._worker(creator, queues[name], completed, failed))
+            for name, creator in self.creators.items()
+            for _ in range(self.concurrency[name])
+        ]
+
+        start = time.perf_counter()
+        try:
+            if hasattr(orders, "__aiter__"):
+                async for order in orders:
+                    await self._submit(order, queues, failed)
+            else:
+                for order in orders:
+                    await self._submit(order, queues, failed)
+            for queue in queues.values():
+                await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return Report(completed, failed, time.perf_counter() - start)
+
+    async def _submit(self, order: Order, queues: Dict[str, asyncio.Queue], failed: List[Order]) -> None:
+        order.submitted = time.perf_counter()
+        queue = queues.get(order.product)
+        if queue is None:
+            order.error = KeyError(f"Nobody bakes {order.product!r}")
+            failed.append(order)
+            return
+        await queue.put(order)
+
+
+class SimulatedOven:
+    """
+    The oven the pipeline is tested with, offline: room for `capacity` pizzas at
+    a time, each one taking bake_time seconds (plus up to `jitter` more).
+    """
+
+    def __init__(self, capacity: int = 4, bake_time: float = 0.01, jitter: float = 0.0, seed: int = 42) -> None:
+        self.capacity = capacity
+        self.bake_time = bake_time
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def bake(self) -> None:
+        # Created on first use, inside the event loop that will wait on it
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        async with self._slots:
+            await asyncio.sleep(self.bake_time + self._random.random() * self.jitter)
+
+
+class OvenCreator:
+    """
+    The pizza of a PizzaCreator, once it has been in the oven. Its _bake() is a
+    coroutine, so it is not a PizzaCreator itself (whose create_pizza() expects
+    a pizza from _bake()): create_pizza() is a coroutine here too.
+    """
+
+    def __init__(self, creator: PizzaCreator, oven: SimulatedOven) -> None:
+        self.creator = creator
+        self.oven = oven
+
+    async def _bake(self) -> Pizza:
+        await self.oven.bake()
+        return self.creator._bake()
+
+    async def create_pizza(self) -> str:
+        pizza = await self._bake()
+        return f"PizzaCreator: The same PizzaCreator's code has just worked with {pizza.eat_pizza()}"
+
+
+def orders_stream(count: int, products: List[str], seed: int = 42) -> Iterable[Order]:
+    rng = random.Random(seed)
+    return (Order(number, rng.choice(products)) for number in range(count))
+
+
+async def demo(count: int = 1_000) -> None:
+    oven = SimulatedOven(capacity=8, bake_time=0.01, jitter=0.005)
+    pipeline = OrderPipeline(
+        {
+            "margherita": OvenCreator(PizzaMargheritaCreator(), oven),
+            "marinara": OvenCreator(PizzaMarinaraCreator(), oven),
+            "takeaway marinara": PizzaMarinaraCreator(),  # not in the oven: a plain _bake(), run in a thread
+        },
+        concurrency={"margherita": 6, "marinara": 2, "takeaway marinara": 1},
+        queue_size=16,
+    )
+    report = await pipeline.run(orders_stream(count, ["margherita", "marinara", "takeaway marinara", "hawaii"]))
+    print(report)
+    print(f"Order {report.completed[0].number}: {report.completed[0].result}")
+    print(f"Order {report.failed[0].number} failed: {report.failed[0].error!r}")
+    print(await OvenCreator(PizzaMargheritaCreator(), SimulatedOven()).create_pizza())
+
+    # One oven slot per pizza is the limit: more workers than that only queue at the oven door
+    for workers in (1, 4, 8, 16):
+        oven = SimulatedOven(capacity=8, bake_time=0.01)
+        pipeline = OrderPipeline({"margherita": OvenCreator(PizzaMargheritaCreator(), oven)}, workers)
+        report = await pipeline.run(orders_stream(count // 2, ["margherita"]))
+        print(f"{workers:2} workers, 8 oven slots: {report}")
+
+
+if __name__ == "__main__":
+    # python orderPipeline.py [number of orders]
+    asyncio.run(demo(*map(int, sys.argv[1:2])))
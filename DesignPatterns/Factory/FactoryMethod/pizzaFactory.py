@@ -1,5 +1,9 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from array import array
+from itertools import repeat
+from operator import methodcaller
+from typing import Dict, Iterable, List, Optional, Tuple, Type
 
 
 class PizzaCreator(ABC):
@@ -37,6 +41,41 @@ class PizzaCreator(ABC):
 
         return result
 
+    def create_many(self, n: int) -> List[Pizza]:
+        """
+        n pizzas in one call, each one a separate object, as if _bake() was
+        called n times.
+        """
+        bake = self._bake
+        return [bake() for _ in repeat(None, n)]
+
+    def bake_batch(self, n: int) -> PizzaBatch:
+        """
+        n pizzas (n calls to _bake()) stored as a PizzaBatch.
+        """
+        batch = PizzaBatch()
+        batch.extend(self.create_many(n))
+        return batch
+
+    def create_pizza_batch(self, n: int, dedupe: bool = False) -> List[str]:
+        """
+        create_pizza() for n pizzas: n calls to _bake() and to eat_pizza(), the
+        results formatted in one pass over the batch.
+
+        With dedupe=True only one pizza per different recipe is eaten (see
+        PizzaBatch.eat_all): only right when eat_pizza() depends on nothing but
+        the class and the ingredients of the pizza.
+        """
+        prefix = "PizzaCreator: The same PizzaCreator's code has just worked with "
+        if dedupe:
+            results = self.bake_batch(n).eat_all(dedupe=True)
+        else:
+            # Each pizza is eaten as soon as it is baked: a million live pizzas
+            # would only keep the garbage collector busy
+            bake = self._bake
+            results = map(methodcaller("eat_pizza"), (bake() for _ in repeat(None, n)))
+        return list(map(prefix.__add__, results))
+
 
 """
 Concrete Creators override the factory method in order to change the resulting
@@ -92,6 +131,85 @@ class PizzaMarinara(Pizza):
         return "{Result of the PizzaMarinara}"
 
 
+class PizzaBatch:
+    """
+    Many pizzas without one object each. A Pizza is plain data (its class and
+    three ingredients), so a batch keeps one array per column: the number of the
+    pizza class, and the numbers of its base, cheese and herb in a table of
+    ingredients that every pizza of the batch shares. One byte per column and per pizza.
+
+    batch[i] builds the Pizza object back when one is needed. eat_all() only builds
+    one pizza per different recipe, as two pizzas with the same class and
+    ingredients give the same result.
+    """
+
+    def __init__(self) -> None:
+        self.classes: List[Type[Pizza]] = []
+        self.ingredients: List[Optional[str]] = [None]
+        self._codes: Dict[object, int] = {None: 0}
+        self.kinds = array("B")
+        self.bases = array("B")
+        self.cheeses = array("B")
+        self.herbs = array("B")
+
+    def _code(self, table: list, value: object) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            if len(table) >= 256:
+                raise ValueError("A batch holds 256 different pizza classes or ingredients at most")
+            code = self._codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def _row(self, pizza: Pizza) -> Tuple[int, int, int, int]:
+        return (
+            self._code(self.classes, type(pizza)),
+            self._code(self.ingredients, pizza.base),
+            self._code(self.ingredients, pizza.cheese),
+            self._code(self.ingredients, pizza.herb),
+        )
+
+    def append_many(self, pizza: Pizza, n: int) -> None:
+        """n pizzas just like this one"""
+        for column, code in zip((self.kinds, self.bases, self.cheeses, self.herbs), self._row(pizza)):
+            column.extend(array("B", [code]) * n)
+
+    def append(self, pizza: Pizza) -> None:
+        self.append_many(pizza, 1)
+
+    def extend(self, pizzas: Iterable[Pizza]) -> None:
+        rows = [self._row(pizza) for pizza in pizzas]
+        for column, codes in zip((self.kinds, self.bases, self.cheeses, self.herbs), zip(*rows)):
+            column.extend(codes)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, i: int) -> Pizza:
+        ingredients = self.ingredients
+        return self.classes[self.kinds[i]](
+            base=ingredients[self.bases[i]],
+            cheese=ingredients[self.cheeses[i]],
+            herb=ingredients[self.herbs[i]],
+        )
+
+    def eat_all(self, dedupe: bool = False) -> List[str]:
+        """
+        eat_pizza() of every pizza. With dedupe=True, pizzas with the same class
+        and ingredients share the result of the first one.
+        """
+        if not dedupe:
+            return [self[i].eat_pizza() for i in range(len(self))]
+        results: Dict[Tuple[int, int, int, int], str] = {}
+        eaten = []
+        for i, row in enumerate(zip(self.kinds, self.bases, self.cheeses, self.herbs)):
+            result = results.get(row)
+            if result is None:
+                result = results[row] = self[i].eat_pizza()
+            eaten.append(result)
+        return eaten
+
+
 def client_code(creator: PizzaCreator) -> None:
     """
     The client code works with an instance of a concrete creator, albeit through
@@ -110,3 +228,11 @@ if __name__ == "__main__":
 
     print("App: Launched with the PizzaMarinara.")
     client_code(PizzaMarinaraCreator())
+    print("\n")
+
+    print("App: A batch of 1000 orders, half of each.")
+    batch = PizzaMargheritaCreator().bake_batch(500)
+    batch.extend(PizzaMarinaraCreator().create_many(500))
+    eaten = batch.eat_all(dedupe=True)
+    print(f"{len(batch)} pizzas in {len(batch) * 4} bytes of columns, the last one: {eaten[-1]}, "
+          f"with {batch[-1].herb}")
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import sys
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Type
+
+from pizzaFactory import Pizza, PizzaCreator, PizzaMarinaraCreator, PizzaMargheritaCreator
+
+
+class PizzaPool:
+    """
+    A bounded pool of pizzas of one class. acquire() hands out a pizza that was
+    released earlier, and only calls the factory (PizzaCreator._bake) when the
+    pool is empty. release() runs the reset hook, so the next customer gets a
+    pizza as good as new, and keeps it for later, unless maxsize pizzas are
+    already waiting: then it is simply dropped.
+
+    acquire() and release() can be called from any thread.
+    """
+
+    def __init__(self, factory: Callable[[], Pizza], maxsize: int = 64,
+                 reset: Optional[Callable[[Pizza], None]] = None) -> None:
+        self.factory = factory
+        self.maxsize = maxsize
+        self.reset = reset
+        self._free: List[Pizza] = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.high_water = 0
+
+    def acquire(self) -> Pizza:
+        with self._lock:
+            self.in_use += 1
+            if self.in_use > self.high_water:
+                self.high_water = self.in_use
+            if self._free:
+                self.reused += 1
+                return self._free.pop()
+            self.created += 1
+        # Outside of the lock: baking may be slow, and other threads can go on meanwhile
+        return self.factory()
+
+    def release(self, pizza: Pizza) -> None:
+        if self.reset is not None:
+            self.reset(pizza)
+        with self._lock:
+            self.in_use -= 1
+            if len(self._free) < self.maxsize:
+                self._free.append(pizza)
+            else:
+                self.discarded += 1
+
+    def add(self, pizza: Pizza) -> None:
+        """A pizza that was baked without acquire(): kept for later if there is room"""
+        with self._lock:
+            self.created += 1
+            if len(self._free) < self.maxsize:
+                self._free.append(pizza)
+            else:
+                self.discarded += 1
+
+    @contextmanager
+    def checkout(self) -> Iterator[Pizza]:
+        pizza = self.acquire()
+        try:
+            yield pizza
+        finally:
+            self.release(pizza)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "discarded": self.discarded,
+            "in_use": self.in_use,
+            "free": len(self._free),
+            "high_water": self.high_water,
+        }
+
+
+def restore(template: Pizza) -> Callable[[Pizza], None]:
+    """
+    The default reset hook: put back the attributes the pizza had when it was baked
+    (and remove any that were added since). It keeps its own deep copy of them, and
+    hands out deep copies again, so changing a pizza in place (its dough, say) can
+    never change what the next pizzas are reset to.
+    """
+    fresh = copy.deepcopy(vars(template))
+
+    def reset(pizza: Pizza) -> None:
+        state = vars(pizza)
+        if state != fresh:
+            state.clear()
+            state.update(copy.deepcopy(fresh))
+
+    return reset
+
+
+class PooledPizzaCreator:
+    """
+    The pooled mode of a PizzaCreator: the same create_pizza(), but the pizzas
+    come from a pool. There is one pool per creator class, shared by every
+    PooledPizzaCreator given the same pools dict: two creators of the same pizza
+    class may still bake (and reset) it differently. order() is the context
+    manager for code that wants to hold on to the pizza itself.
+    """
+
+    def __init__(self, creator: PizzaCreator, maxsize: int = 64,
+                 pools: Optional[Dict[Type[PizzaCreator], PizzaPool]] = None) -> None:
+        self.creator = creator
+        self.pools = {} if pools is None else pools
+        self.pool = self.pools.get(type(creator))
+        if self.pool is None:
+            # Baking one pizza tells us what a fresh one looks like
+            first = creator._bake()
+            self.pool = self.pools[type(creator)] = PizzaPool(creator._bake, maxsize, restore(first))
+            self.pool.add(first)
+
+    def order(self):
+        return self.pool.checkout()
+
+    def create_pizza(self) -> str:
+        # acquire/release rather than checkout(): a generator based context manager costs more than the pizza
+        pizza = self.pool.acquire()
+        try:
+            return f"PizzaCreator: The same PizzaCreator's code has just worked with {pizza.eat_pizza()}"
+        finally:
+            self.pool.release(pizza)
+
+
+class SlowDoughCreator(PizzaMargheritaCreator):
+    """A pizza that takes real work to make: its recipe is checked against a signature first"""
+
+    recipe = bytes(256 * 1024)
+
+    def _bake(self) -> Pizza:
+        pizza = super()._bake()
+        pizza.dough = hashlib.sha256(self.recipe).hexdigest()
+        return pizza
+
+
+def benchmark(orders: int = 1_000_000) -> None:
+    # A pool only pays off when baking costs more than the lock and the reset hook
+    print(f"{orders} orders:")
+    for creator in (PizzaMargheritaCreator(), PizzaMarinaraCreator(), SlowDoughCreator()):
+        start = perf_counter()
+        for _ in range(orders):
+            creator.create_pizza()
+        unpooled = perf_counter() - start
+
+        pooled_creator = PooledPizzaCreator(creator)
+        start = perf_counter()
+        for _ in range(orders):
+            pooled_creator.create_pizza()
+        pooled = perf_counter() - start
+
+        name = type(creator).__name__
+        print(f" - {name}: {orders / unpooled:,.0f} orders/s unpooled, {orders / pooled:,.0f} orders/s pooled")
+
+    pools: Dict[Type[PizzaCreator], PizzaPool] = {}
+    kitchen = PooledPizzaCreator(PizzaMargheritaCreator(), maxsize=8, pools=pools)
+    with ThreadPoolExecutor(8) as executor:
+        start = perf_counter()
+        list(executor.map(lambda _: kitchen.create_pizza(), range(orders // 10)))
+        threaded = perf_counter() - start
+    print(f" - 8 threads sharing a pool: {orders // 10 / threaded:,.0f} orders/s, {kitchen.pool.stats()}")
+
+
+if __name__ == "__main__":
+    margherita = PooledPizzaCreator(PizzaMargheritaCreator(), maxsize=2)
+    print(margherita.create_pizza())
+
+    with margherita.order() as first, margherita.order() as second, margherita.order() as third:
+        first.herb = "rocket"  # the reset hook takes it off again
+        print(f"Three pizzas at the same table: {margherita.pool.stats()}")
+    print(f"After the meal (one did not fit back in the pool): {margherita.pool.stats()}")
+
+    with margherita.order() as pizza:
+        print(f"The next customer gets {pizza.herb}")
+
+    # python pizzaPool.py bench [number of orders]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
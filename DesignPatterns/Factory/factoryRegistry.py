@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import re
+import sys
+import tempfile
+from importlib import metadata
+from time import perf_counter
+from timeit import timeit
+from typing import Any, Callable, Dict, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _is_file(module: Any, path: str) -> bool:
+    filename = getattr(module, "__file__", None)
+    return filename is not None and os.path.realpath(filename) == os.path.realpath(path)
+
+
+def load_module(path: str) -> Any:
+    """
+    The module of the file at path, imported only once:
+    - a module already imported from that file (import pizzaFactory) is reused,
+      and so is a normal import when the file's directory is on sys.path: the
+      classes are the ones everybody else sees, isinstance() and pickle work
+    - otherwise it is loaded from its location, under a top level name made from
+      its whole path (two pizzaFactory.py in different directories stay two
+      modules). A later plain "import pizzaFactory" does not know about that
+      name: it imports the file a second time, with classes of its own.
+    """
+    path = os.path.abspath(os.path.join(HERE, path))
+    directory, filename = os.path.split(path)
+    stem = os.path.splitext(filename)[0]
+    module = sys.modules.get(stem)
+    if module is not None and _is_file(module, path):
+        return module
+    if module is None and any(os.path.realpath(entry or os.curdir) == os.path.realpath(directory) for entry in sys.path):
+        module = importlib.import_module(stem)
+        if _is_file(module, path):
+            return module
+
+    name = re.sub(r"\W", "_", os.path.splitext(path)[0])
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Cannot load {path}")
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+    return module
+
+
+def load_attribute(target: str) -> Any:
+    """
+    Import "path/to/module.py:Attribute" (relative to this directory, or absolute)
+    and return the attribute. These directories are not packages: see load_module()
+    for how the file is imported.
+    """
+    path, _, attribute = target.partition(":")
+    return getattr(load_module(path), attribute)
+
+
+class _Lazy:
+    """
+    Stands in for a factory whose module is not imported yet. The first call
+    imports it and puts the real factory in the registry in its place, so from
+    then on a lookup finds the factory itself.
+    """
+
+    def __init__(self, registry: FactoryRegistry, name: str, load: Callable[[], Callable[..., Any]]) -> None:
+        self.registry = registry
+        self.name = name
+        self.load = load
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        factory = self.load()
+        self.registry._factories[self.name] = factory
+        return factory(*args, **kwargs)
+
+
+class FactoryRegistry:
+    """
+    Instead of the caller importing PizzaMargheritaCreator or NeapolitanFactory and
+    choosing between them by hand, factories are registered under a name (or
+    variant), and create(name) is a single dict lookup plus the call.
+
+    A factory can be registered:
+    - with the decorator: @registry.register("diavola")
+    - lazily from a file: registry.register_lazy("margherita", "FactoryMethod/pizzaFactory.py:PizzaMargheritaCreator"),
+      nothing is imported until the first create("margherita")
+    - lazily from the entry points of installed packages: registry.load_entry_points("pizza.creators")
+    """
+
+    def __init__(self) -> None:
+        self._factories: Dict[str, Callable[..., Any]] = {}
+
+    def register(self, name: str, factory: Optional[Callable[..., Any]] = None):
+        if factory is None:
+            def decorator(factory: Callable[..., Any]) -> Callable[..., Any]:
+                self.register(name, factory)
+                return factory
+            return decorator
+        if name in self._factories:
+            raise ValueError(f"{name!r} is already registered")
+        self._factories[name] = factory
+        return factory
+
+    def register_lazy(self, name: str, target: str) -> None:
+        self.register(name, _Lazy(self, name, lambda: load_attribute(target)))
+
+    def load_entry_points(self, group: str) -> int:
+        """Register (lazily) every entry point of the group, returns how many there were"""
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, "select"):
+            found = entry_points.select(group=group)
+        else:  # Python < 3.10
+            found = entry_points.get(group, [])
+        for entry_point in found:
+            self.register(entry_point.name, _Lazy(self, entry_point.name, entry_point.load))
+        return len(found)
+
+    def create(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            factory = self._factories[name]
+        except KeyError:
+            raise KeyError(f"No factory registered as {name!r}") from None
+        return factory(*args, **kwargs)
+
+    def is_loaded(self, name: str) -> bool:
+        return not isinstance(self._factories[name], _Lazy)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def __iter__(self):
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        return len(self._factories)
+
+
+registry = FactoryRegistry()
+registry.register_lazy("margherita", "FactoryMethod/pizzaFactory.py:PizzaMargheritaCreator")
+registry.register_lazy("marinara", "FactoryMethod/pizzaFactory.py:PizzaMarinaraCreator")
+registry.register_lazy("neapolitan", "AbstractFactory/abstractPizzaFactory.py:NeapolitanFactory")
+registry.register_lazy("roman", "AbstractFactory/abstractPizzaFactory.py:RomanFactory")
+
+
+def benchmark(variants: int = 500, calls: int = 1_000_000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(variants):
+            with open(os.path.join(directory, f"variant{i}.py"), "w") as fh:
+                fh.write(
+                    "import json, decimal, fractions\n"
+                    f"RECIPE = json.loads('{{\"flour\": {i}, \"water\": 0.6}}')\n"
+                    f"class Variant{i}:\n"
+                    "    def eat_pizza(self):\n"
+                    f"        return 'variant {i}'\n"
+                )
+
+        start = perf_counter()
+        lazy = FactoryRegistry()
+        for i in range(variants):
+            lazy.register_lazy(f"variant{i}", os.path.join(directory, f"variant{i}.py:Variant{i}"))
+        lazy_startup = perf_counter() - start
+
+        start = perf_counter()
+        eager = FactoryRegistry()
+        for i in range(variants):
+            eager.register(f"variant{i}", load_attribute(os.path.join(directory, f"variant{i}.py:Variant{i}")))
+        eager_startup = perf_counter() - start
+        prefix = re.sub(r"\W", "_", directory)
+        for name in [name for name in sys.modules if name.startswith(prefix)]:
+            del sys.modules[name]
+
+        print(f"Startup with {variants} variants: {lazy_startup * 1000:.1f} ms lazy, {eager_startup * 1000:.1f} ms eager")
+
+        start = perf_counter()
+        lazy.create("variant7")
+        print(f"First create() of a lazy variant (imports it): {(perf_counter() - start) * 1e6:.0f} us")
+
+        # The hand written alternative: an if/elif chain going through the choices one by one
+        classes = [type(eager.create(f"variant{i}")) for i in range(variants)]
+        chain = "".join(
+            f"    {'if' if i == 0 else 'elif'} name == 'variant{i}':\n        return classes[{i}]()\n"
+            for i in range(variants)
+        )
+        namespace = {"classes": classes}
+        exec(f"def by_hand(name):\n{chain}", namespace)
+        by_hand = namespace["by_hand"]
+
+        middle = f"variant{variants // 2}"
+        registered = timeit(lambda: lazy.create("variant7"), number=calls) / calls
+        first = timeit(lambda: by_hand("variant0"), number=calls) / calls
+        halfway = timeit(lambda: by_hand(middle), number=calls // 10) / (calls // 10)
+        print(f"Dispatch: create() {registered * 1e9:.0f} ns, if/elif over {variants} variants "
+              f"{first * 1e9:.0f} ns for the first one, {halfway * 1e9:.0f} ns halfway down")
+
+
+if __name__ == "__main__":
+    print(f"Registered: {list(registry)}, loaded: {[name for name in registry if registry.is_loaded(name)]}")
+
+    creator = registry.create("margherita")
+    print(creator.create_pizza())
+    print(f"Loaded now: {[name for name in registry if registry.is_loaded(name)]}")
+
+    factory = registry.create("roman")
+    print(factory.create_calzone().another_eat_calzone(factory.create_pizza()))
+
+    PizzaCreator = load_attribute("FactoryMethod/pizzaFactory.py:PizzaCreator")
+    Pizza = load_attribute("FactoryMethod/pizzaFactory.py:Pizza")
+
+    class PizzaDiavola(Pizza):
+        def eat_pizza(self) -> str:
+            return "{Result of the PizzaDiavola}"
+
+    @registry.register("diavola")
+    class PizzaDiavolaCreator(PizzaCreator):
+        def _bake(self) -> Pizza:
+            return PizzaDiavola(base="tomato", cheese="mozzarella", herb="chili")
+
+    print(registry.create("diavola").create_pizza())
+
+    # python factoryRegistry.py bench [number of variants]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,308 @@
+"""
+PropertyDependencies.py ends with a problem: can_vote depends on age, so the age setter
+has to remember the old can_vote and compare it by hand. With hundreds of properties
+depending on each other, like cells in a spreadsheet, that does not scale.
+
+Here the dependencies are discovered automatically instead:
+- a computed property records every property it reads while it is being evaluated,
+  which builds a dependency graph (no more hand written "###" lines)
+- its value is memoized until one of those properties changes
+- when a property is set, only the computed properties that (directly or indirectly)
+  read it are recomputed, each one exactly once, in dependency order ("rank"), so
+  nobody ever sees a half updated state (a "glitch")
+- if a recomputed value did not change, nothing that depends on it is recomputed
+- property_changed is fired for the property that was set and for every computed
+  property whose value changed, after everything has been recomputed
+
+Properties can be declared on the class (observable / computed), or defined at
+runtime with define() / define_computed() for objects with thousands of them.
+What is being evaluated is tracked in module level state, so use it from one thread at a time.
+"""
+import heapq
+import sys
+from itertools import count
+from time import perf_counter
+
+
+class Event(list):
+    """List of functions that need to be called/invoked whenever this Event happens"""
+
+    def __call__(self, *args, **kwargs):
+        for item in self:
+            item(*args, **kwargs)
+
+
+class _Node:
+    __slots__ = ("owner", "name", "compute", "value", "evaluated", "deps", "dependents", "rank", "queued")
+
+    def __init__(self, owner, name, compute=None, value=None):
+        self.owner = owner
+        self.name = name
+        self.compute = compute
+        self.value = value
+        self.evaluated = compute is None
+        self.deps = set()
+        self.dependents = set()
+        self.rank = 0  # 0 for plain values, 1 + the highest rank of the inputs for computed ones
+        self.queued = False
+
+
+# One set per computed property being evaluated right now, innermost last
+_reading = []
+_evaluating = set()
+_order = count()
+
+# Reading a property nobody evaluated yet evaluates it right away, from inside the
+# computed property that reads it. Deeper than this, it is left to a stack instead:
+# a column of 10000 cells read from the bottom would otherwise overflow Python's own stack.
+_MAX_NESTING = 50
+
+
+class _Pending(BaseException):
+    """Raised by a read too deep down: node has to be evaluated first.
+    Not an Exception, so a compute function catching Exception lets it through."""
+
+    def __init__(self, node):
+        self.node = node
+
+
+def _read(node):
+    if _reading:
+        _reading[-1].add(node)
+    if not node.evaluated:
+        if len(_reading) >= _MAX_NESTING:
+            raise _Pending(node)
+        _evaluate(node)
+    return node.value
+
+
+def _evaluate(node):
+    """Evaluate node, and first whatever it needs that is too deep for recursion.
+    A computed property stopped by _Pending is simply computed again once its input is ready."""
+    stack = [node]
+    waiting = {node}
+    while stack:
+        top = stack[-1]
+        try:
+            _compute(top)
+        except _Pending as pending:
+            if pending.node in waiting:
+                raise RuntimeError(f"{pending.node.name} depends on itself") from None
+            stack.append(pending.node)
+            waiting.add(pending.node)
+        else:
+            waiting.discard(stack.pop())
+
+
+def _compute(node):
+    if node in _evaluating:
+        raise RuntimeError(f"{node.name} depends on itself")
+    _evaluating.add(node)
+    deps = set()
+    _reading.append(deps)
+    try:
+        node.value = node.compute(node.owner)
+    finally:
+        _reading.pop()
+        _evaluating.discard(node)
+    node.evaluated = True
+
+    for old in node.deps - deps:
+        old.dependents.discard(node)
+    for new in deps - node.deps:
+        new.dependents.add(node)
+    node.deps = deps
+    _raise_rank(node, 1 + max((dep.rank for dep in deps), default=0))
+
+
+def _raise_rank(node, rank):
+    """A computed property that started reading something deeper moves down the
+    order, and so does everything that depends on it"""
+    stack = [(node, rank)]
+    while stack:
+        node, rank = stack.pop()
+        if rank > node.rank:
+            node.rank = rank
+            stack.extend((dependent, rank + 1) for dependent in node.dependents)
+
+
+def _propagate(source):
+    """Recompute what depends on source, lowest rank first. Returns the changed nodes."""
+    heap = []
+
+    def push(nodes):
+        for node in nodes:
+            if not node.queued:
+                node.queued = True
+                heapq.heappush(heap, (node.rank, next(_order), node))
+
+    changed = []
+    push(source.dependents)
+    try:
+        while heap:
+            rank, _, node = heapq.heappop(heap)
+            if node.rank > rank:
+                # its rank went up after it was queued: come back to it later
+                heapq.heappush(heap, (node.rank, next(_order), node))
+                continue
+            node.queued = False
+            old = node.value
+            try:
+                _evaluate(node)
+            except BaseException:
+                _invalidate(node)
+                raise
+            if node.value != old:
+                changed.append(node)
+                push(node.dependents)
+    finally:
+        # When a compute raised, what is still queued must be queued again by the next change,
+        # and its value is out of date: the next read computes it again
+        for _, _, node in heap:
+            node.queued = False
+            node.evaluated = False
+    return changed
+
+
+def _invalidate(node):
+    """node could not be computed: it, and what depends on it, are computed again when read"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node.evaluated:
+            node.evaluated = False
+            stack.extend(node.dependents)
+
+
+class ReactiveObservable:
+    def __init__(self):
+        self.property_changed = Event()
+        self._nodes = {}
+
+    def _node(self, name):
+        node = self._nodes.get(name)
+        if node is None:
+            declared = getattr(type(self), name, None)
+            if isinstance(declared, observable):
+                node = _Node(self, name, value=declared.default)
+            elif isinstance(declared, computed):
+                node = _Node(self, name, compute=declared.function)
+            else:
+                raise AttributeError(f"{type(self).__name__} has no reactive property {name!r}")
+            self._nodes[name] = node
+        return node
+
+    def define(self, name, value=None):
+        self._nodes[name] = _Node(self, name, value=value)
+
+    def define_computed(self, name, function):
+        """function(self) -> value; it may read any other reactive property"""
+        self._nodes[name] = _Node(self, name, compute=function)
+
+    def get(self, name):
+        return _read(self._node(name))
+
+    def set(self, name, value):
+        node = self._node(name)
+        if node.compute is not None:
+            raise AttributeError(f"{name} is computed, it cannot be set")
+        if node.value == value:
+            return
+        node.value = value
+        changed = _propagate(node)
+        self.property_changed(name, value)
+        for other in changed:
+            other.owner.property_changed(other.name, other.value)
+
+
+class observable:
+    """A plain value that computed properties can depend on"""
+
+    def __init__(self, default=None):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        return self if obj is None else obj.get(self.name)
+
+    def __set__(self, obj, value):
+        obj.set(self.name, value)
+
+
+class computed:
+    """Decorator for a property calculated from other (observable or computed) properties"""
+
+    def __init__(self, function):
+        self.function = function
+        self.name = function.__name__
+
+    def __get__(self, obj, objtype=None):
+        return self if obj is None else obj.get(self.name)
+
+
+class Person(ReactiveObservable):
+    age = observable(0)
+    citizen = observable(True)
+
+    @computed
+    def can_vote(self):
+        return self.citizen and self.age >= 18
+
+    @computed
+    def can_be_president(self):
+        return self.can_vote and self.age >= 35
+
+
+def spreadsheet(cells):
+    """A column where every cell is the one above it plus the value in A0"""
+    sheet = ReactiveObservable()
+    sheet.define("A0", 1)
+    sheet.define_computed("B0", lambda s: s.get("A0"))
+    for i in range(1, cells):
+        sheet.define_computed(f"B{i}", lambda s, above=f"B{i - 1}": s.get(above) + s.get("A0"))
+        # and a cell nothing else depends on, to show that it is left alone
+        sheet.define(f"A{i}", i)
+    return sheet
+
+
+def benchmark(cells=10_000):
+    sheet = spreadsheet(cells)
+    last = f"B{cells - 1}"
+    start = perf_counter()
+    sheet.get(last)  # evaluates (and records) the whole column
+    print(f"First read of {last}: {(perf_counter() - start) * 1000:.1f} ms")
+
+    changes = []
+    sheet.property_changed.append(lambda name, value: changes.append(name))
+    start = perf_counter()
+    sheet.set("A0", 2)
+    everything = perf_counter() - start
+    print(f"Changing A0 recomputed {len(changes) - 1} cells in {everything * 1000:.1f} ms, {last} = {sheet.get(last)}")
+
+    changes.clear()
+    start = perf_counter()
+    sheet.set("A1", 100)
+    nothing = perf_counter() - start
+    print(f"Changing A1 recomputed {len(changes) - 1} cells in {nothing * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    def person_changed(name, value):
+        print(f"{name} changed to {value}")
+
+    p = Person()
+    p.property_changed.append(person_changed)
+    print(f"Can vote: {p.can_vote}")
+
+    for age in range(16, 20):
+        print(f"Changing age to {age}")
+        p.age = age
+
+    print("Changing citizenship")
+    p.citizen = False
+
+    # python ComputedProperties.py bench [number of cells]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
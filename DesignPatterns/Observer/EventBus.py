@@ -0,0 +1,254 @@
+"""
+Event(list) is a great way to learn the Observer pattern, but it has limits:
+- remove() searches the whole list and compares every handler with ==
+- every handler runs in the publisher's thread, one after the other,
+  so a single slow handler makes the publisher (and everyone after it) wait
+- removing a handler while the event is being called skips the next handler
+
+The EventBus keeps one dispatch table (a dict) per topic:
+- subscribe() returns a token, and unsubscribe(token) is O(1)
+- mode="sync" calls handlers right away, like Event does
+- mode="thread" hands every call to a thread pool, mode="asyncio" to an event loop
+  (coroutine handlers are awaited). In those modes each subscriber can have a bounded
+  queue; when it is full the policy decides: "drop" the new call, "block" the publisher
+  until there is room, or "coalesce" the pending calls into only the newest one.
+
+bus.event(topic) returns an object that behaves like an Event (append, remove, call),
+so Person.falls_ill or PropertyObservable.property_changed can be backed by a bus
+without changing any of the code that uses them.
+"""
+import asyncio
+import inspect
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import Observer
+import PropertyObservers
+
+DROP = "drop"
+BLOCK = "block"
+COALESCE = "coalesce"
+
+
+class Mailbox:
+    """Pending calls of one subscriber, delivered in order by one worker at a time"""
+
+    def __init__(self, handler, maxsize=None, policy=DROP):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.pending = deque()
+        self.dropped = 0
+        self.scheduled = False
+        self.room = threading.Condition()
+
+    def put(self, args, kwargs):
+        """Queue a call, returns True if nobody is draining the mailbox yet"""
+        with self.room:
+            if self.maxsize is not None and len(self.pending) >= self.maxsize:
+                if self.policy == DROP:
+                    self.dropped += 1
+                    return False
+                if self.policy == COALESCE:
+                    self.dropped += len(self.pending)
+                    self.pending.clear()
+                else:
+                    while len(self.pending) >= self.maxsize:
+                        self.room.wait()
+            self.pending.append((args, kwargs))
+            if self.scheduled:
+                return False
+            self.scheduled = True
+            return True
+
+    def _next(self):
+        with self.room:
+            if not self.pending:
+                self.scheduled = False
+                return None
+            call = self.pending.popleft()
+            self.room.notify()
+            return call
+
+    # Nobody up the call stack can catch a handler's exception here,
+    # and letting it escape would leave the mailbox marked as scheduled forever
+    def drain(self):
+        call = self._next()
+        while call is not None:
+            try:
+                self.handler(*call[0], **call[1])
+            except Exception:
+                traceback.print_exc()
+            call = self._next()
+
+    async def drain_async(self):
+        call = self._next()
+        while call is not None:
+            try:
+                result = self.handler(*call[0], **call[1])
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                traceback.print_exc()
+            call = self._next()
+
+
+class EventBus:
+    def __init__(self, mode="sync", max_workers=None, loop=None):
+        if mode not in ("sync", "thread", "asyncio"):
+            raise ValueError(f"Unknown mode {mode!r}")
+        self.mode = mode
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(max_workers) if mode == "thread" else None
+        self._topics = {}  # topic -> {token: handler (sync) or Mailbox}
+        self._tokens = {}  # token -> topic
+        self._next_token = count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic, handler, maxsize=None, policy=DROP):
+        if policy not in (DROP, BLOCK, COALESCE):
+            raise ValueError(f"Unknown policy {policy!r}")
+        if policy == BLOCK and self.mode == "asyncio":
+            raise ValueError("A blocking queue would block the event loop it is waiting for")
+        token = next(self._next_token)
+        entry = handler if self.mode == "sync" else Mailbox(handler, maxsize, policy)
+        with self._lock:
+            self._topics.setdefault(topic, {})[token] = entry
+            self._tokens[token] = topic
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            topic = self._tokens.pop(token)
+            subscribers = self._topics[topic]
+            del subscribers[token]
+            if not subscribers:
+                del self._topics[topic]
+
+    def handlers(self, topic):
+        return [
+            entry if self.mode == "sync" else entry.handler
+            for entry in self._topics.get(topic, {}).values()
+        ]
+
+    def publish(self, topic, *args, **kwargs):
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return
+        # A snapshot, so handlers can (un)subscribe while we are going through them
+        entries = tuple(subscribers.values())
+        if self.mode == "sync":
+            for handler in entries:
+                handler(*args, **kwargs)
+            return
+        for mailbox in entries:
+            if mailbox.put(args, kwargs):
+                self._schedule(mailbox)
+
+    def _schedule(self, mailbox):
+        if self.mode == "thread":
+            self.executor.submit(mailbox.drain)
+            return
+        loop = self.loop
+        if loop is None:
+            asyncio.get_running_loop().create_task(mailbox.drain_async())
+        else:
+            loop.call_soon_threadsafe(lambda: loop.create_task(mailbox.drain_async()))
+
+    def event(self, topic):
+        return BusEvent(self, topic)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+
+class BusEvent:
+    """Looks like an Event(list) to its users, but every handler is a bus subscription"""
+
+    def __init__(self, bus, topic):
+        self.bus = bus
+        self.topic = topic
+        self._tokens = {}  # handler -> tokens, oldest first (a handler may be appended twice)
+
+    def append(self, handler):
+        self._tokens.setdefault(handler, []).append(self.bus.subscribe(self.topic, handler))
+
+    def remove(self, handler):
+        tokens = self._tokens.get(handler)
+        if not tokens:
+            raise ValueError("handler is not subscribed to this event")
+        self.bus.unsubscribe(tokens.pop(0))
+        if not tokens:
+            del self._tokens[handler]
+
+    def __call__(self, *args, **kwargs):
+        self.bus.publish(self.topic, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self.bus.handlers(self.topic))
+
+    def __len__(self):
+        return len(self.bus.handlers(self.topic))
+
+    def __getitem__(self, index):
+        return self.bus.handlers(self.topic)[index]
+
+
+if __name__ == "__main__":
+    # The same code as in Observer.py, only the Event behind falls_ill is different
+    bus = EventBus()
+    person = Observer.Person("Sherlock", "221B Baker St")
+    person.falls_ill = bus.event(("falls_ill", person.name))
+
+    person.falls_ill.append(lambda name, address: print(f"{name} is ill"))
+    person.falls_ill.append(Observer.call_doctor)
+    person.catch_a_cold()
+
+    person.falls_ill.remove(Observer.call_doctor)
+    person.falls_ill.remove(person.falls_ill[0])
+    person.catch_a_cold()  # nobody is listening any more
+
+    # And the same code as in PropertyObservers.py
+    p = PropertyObservers.Person()
+    p.property_changed = bus.event(("property_changed", id(p)))
+    ta = PropertyObservers.TrafficAuthority(p)
+    for age in range(14, 18):
+        print(f"Setting age to {age}")
+        p.age = age
+
+    # A slow subscriber does not hold up the publisher in "thread" mode,
+    # and with a coalescing queue it only sees the newest value
+    threaded = EventBus(mode="thread")
+    seen = []
+
+    def slow_dashboard(value):
+        time.sleep(0.01)
+        seen.append(value)
+
+    threaded.subscribe("temperature", slow_dashboard, maxsize=1, policy=COALESCE)
+    threaded.subscribe("temperature", lambda value: None)
+    start = time.perf_counter()
+    for t in range(1000):
+        threaded.publish("temperature", t)
+    print(f"Published 1000 readings in {(time.perf_counter() - start) * 1000:.1f} ms")
+    threaded.close()
+    print(f"The slow dashboard saw {len(seen)} of them, the last one was {seen[-1]}")
+
+    # In "asyncio" mode coroutine handlers are awaited on the loop
+    async def main():
+        async_bus = EventBus(mode="asyncio")
+
+        async def notify(message):
+            await asyncio.sleep(0)
+            print(f"async handler got {message!r}")
+
+        async_bus.subscribe("news", notify)
+        async_bus.publish("news", "hello from the loop")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
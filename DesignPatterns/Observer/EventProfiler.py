@@ -0,0 +1,214 @@
+"""
+When person.catch_a_cold() takes a second, which of the doctors was slow?
+And if one handler raises an exception, Event.__call__ stops right there:
+every handler after it is never called.
+
+ProfiledEvent is an Event that:
+- always isolates its handlers: an exception is reported (to on_error, by default
+  printed to stderr) and the remaining handlers are still called
+- when a DispatchProfiler is attached and enabled, records for every handler the
+  number of calls, errors and a latency histogram, and for every emission its fan-out
+  (how many handlers it had). A handler slower than slow_threshold triggers on_slow.
+When the profiler is disabled, all it costs is one attribute check per emission.
+snapshot() exports everything as plain dicts and lists, ready for json.dumps().
+"""
+import sys
+import time
+import traceback
+import weakref
+from collections import Counter
+from time import perf_counter
+from timeit import timeit
+
+import Observer
+from Observer import Event
+
+
+def handler_name(handler):
+    """Handlers are grouped by name, so two lambdas in the same function share their stats"""
+    function = getattr(handler, "__func__", handler)
+    module = getattr(function, "__module__", None) or "?"
+    return f"{module}.{getattr(function, '__qualname__', repr(handler))}"
+
+
+class HandlerStats:
+    # Bucket i counts the calls that took less than 2**i microseconds
+    buckets = 24
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.histogram = [0] * self.buckets
+        self.last_error = None
+
+    def add(self, seconds, error):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+        bucket = min(int(seconds * 1e6).bit_length(), self.buckets - 1)
+        self.histogram[bucket] += 1
+        if error is not None:
+            self.errors += 1
+            self.last_error = repr(error)
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": self.total / self.calls * 1e3 if self.calls else 0.0,
+            "max_ms": self.slowest * 1e3,
+            "histogram_us": {f"<{2 ** i}": n for i, n in enumerate(self.histogram) if n},
+            "last_error": self.last_error,
+        }
+
+
+class DispatchProfiler:
+    def __init__(self, slow_threshold=None, on_slow=None):
+        """on_slow(name, seconds, args) is called for handlers slower than slow_threshold seconds"""
+        self.enabled = False
+        self.slow_threshold = slow_threshold
+        self.on_slow = on_slow
+        self.handlers = {}  # handler name -> HandlerStats
+        # id(handler) -> (weak reference to it, its HandlerStats), to skip working out the name
+        # every call. Keyed by id: handlers need not be hashable, and are not kept alive by the profiler
+        self._by_handler = {}
+        self.fan_out = Counter()  # number of handlers -> number of emissions
+        self.emissions = 0
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.handlers.clear()
+        self._by_handler.clear()
+        self.fan_out.clear()
+        self.emissions = 0
+
+    def emission(self, handlers):
+        self.emissions += 1
+        self.fan_out[handlers] += 1
+
+    def _stats_of(self, handler):
+        name = handler_name(handler)
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+        key, by_handler = id(handler), self._by_handler
+
+        def forget(ref):
+            if by_handler.get(key, (None,))[0] is ref:
+                del by_handler[key]
+
+        try:
+            by_handler[key] = (weakref.ref(handler, forget), stats)
+        except TypeError:
+            pass  # no weak references to it: its name is worked out every call
+        return stats
+
+    def record(self, handler, seconds, error, args):
+        entry = self._by_handler.get(id(handler))
+        # Another object may have been given the id of a handler that is gone
+        if entry is not None and entry[0]() is handler:
+            stats = entry[1]
+        else:
+            stats = self._stats_of(handler)
+        stats.add(seconds, error)
+        if self.slow_threshold is not None and seconds >= self.slow_threshold and self.on_slow is not None:
+            self.on_slow(handler_name(handler), seconds, args)
+
+    def snapshot(self):
+        return {
+            "emissions": self.emissions,
+            "fan_out": dict(sorted(self.fan_out.items())),
+            "handlers": {name: stats.snapshot() for name, stats in self.handlers.items()},
+        }
+
+
+def print_error(handler, error):
+    print(f"Handler {handler_name(handler)} failed:", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+
+class ProfiledEvent(Event):
+    def __init__(self, *args, profiler=None, on_error=print_error):
+        super().__init__(*args)
+        self.profiler = profiler
+        self.on_error = on_error
+
+    def __call__(self, *args, **kwargs):
+        profiler = self.profiler
+        if profiler is None or not profiler.enabled:
+            for item in self:
+                try:
+                    item(*args, **kwargs)
+                except Exception as error:
+                    self.on_error(item, error)
+            return
+
+        profiler.emission(len(self))
+        for item in self:
+            error = None
+            start = perf_counter()
+            try:
+                item(*args, **kwargs)
+            except Exception as e:
+                error = e
+            profiler.record(item, perf_counter() - start, error, args)
+            if error is not None:
+                self.on_error(item, error)
+
+
+def benchmark(emissions=200_000):
+    def handler(name, address):
+        pass
+
+    plain = Event([handler] * 5)
+    profiler = DispatchProfiler()
+    profiled = ProfiledEvent([handler] * 5, profiler=profiler)
+
+    base = timeit(lambda: plain("Sherlock", "221B Baker St"), number=emissions)
+    off = timeit(lambda: profiled("Sherlock", "221B Baker St"), number=emissions)
+    profiler.enable()
+    on = timeit(lambda: profiled("Sherlock", "221B Baker St"), number=emissions)
+    print(f"{emissions} emissions to 5 handlers:")
+    print(f" - Event:                     {base / emissions * 1e9:6.0f} ns each")
+    print(f" - ProfiledEvent, disabled:   {off / emissions * 1e9:6.0f} ns each")
+    print(f" - ProfiledEvent, enabled:    {on / emissions * 1e9:6.0f} ns each")
+
+
+if __name__ == "__main__":
+    def slow_doctor(name, address):
+        time.sleep(0.05)
+
+    def broken_pager(name, address):
+        raise ConnectionError("pager network is down")
+
+    def too_slow(name, seconds, args):
+        print(f"SLOW: {name} took {seconds * 1000:.0f} ms for {args}")
+
+    profiler = DispatchProfiler(slow_threshold=0.01, on_slow=too_slow)
+    person = Observer.Person("Sherlock", "221B Baker St")
+    person.falls_ill = ProfiledEvent(profiler=profiler, on_error=lambda handler, error: print(f"ERROR: {error}"))
+
+    person.falls_ill.append(slow_doctor)
+    person.falls_ill.append(broken_pager)
+    person.falls_ill.append(Observer.call_doctor)  # still called, even though the pager failed
+
+    person.catch_a_cold()  # profiler disabled
+    profiler.enable()
+    person.catch_a_cold()
+    person.catch_a_cold()
+
+    for name, stats in profiler.snapshot()["handlers"].items():
+        print(f"{name}: {stats}")
+    print(f"fan-out: {profiler.snapshot()['fan_out']}")
+
+    # python EventProfiler.py bench
+    if sys.argv[1:2] == ["bench"]:
+        benchmark()
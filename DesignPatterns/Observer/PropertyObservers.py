@@ -3,7 +3,44 @@ Python has properties that you can use as decorators,
 and we have already set up the observer design pattern using events.
 We can now merge both ideas and set up the "Property Observers",
 which tells us if a property has actually been changed.
+
+Subscribers choose how they want to hear about changes:
+- property_changed(name, value) is called immediately, on every change
+- properties_changed({name: value}) is called once per batch, with only the
+  last value of every property that changed in it
+  (outside of a batch, every change is a batch of its own)
+
+There are two kinds of batches:
+- obj.batch_updates() only batches the changes of obj
+- the module level batch_updates() batches the changes of every observable,
+  each one getting its properties_changed call when the outermost block ends.
+  It only covers the changes made by the thread that opened it.
 """
+import threading
+from contextlib import contextmanager
+
+# Per thread: transaction is id(observable) -> (observable, {name: value}) while a
+# module level batch_updates() is open, depth is how many are nested
+_local = threading.local()
+
+
+@contextmanager
+def batch_updates():
+    """Collect the changes made to any observable inside the block, and notify
+    the batched subscribers of each one once at the end, in the order in which
+    the observables were first changed. Blocks can be nested, the outermost one wins."""
+    depth = getattr(_local, "depth", 0)
+    if not depth:
+        _local.transaction = {}
+    _local.depth = depth + 1
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+        if not _local.depth:
+            changed, _local.transaction = _local.transaction, None
+            for observable, changes in changed.values():
+                observable.properties_changed(changes)
 
 
 class Event(list):
@@ -17,6 +54,41 @@ class Event(list):
 class PropertyObservable:
     def __init__(self):
         self.property_changed = Event()
+        self.properties_changed = Event()
+        self._batch = None
+        self._batch_depth = 0
+
+    def notify_changed(self, name, value):
+        self.property_changed(name, value)
+        if self._batch is not None:
+            self._batch[name] = value  # a later write to the same property replaces this one
+        elif self.properties_changed:
+            self._commit({name: value})
+
+    def _commit(self, changes):
+        transaction = getattr(_local, "transaction", None)
+        if transaction is None:
+            self.properties_changed(changes)
+        elif self.properties_changed:
+            # Inside a module level batch: held back until it ends
+            transaction.setdefault(id(self), (self, {}))[1].update(changes)
+
+    @contextmanager
+    def batch_updates(self):
+        """Collect the changes made to this object only inside the block, and notify
+        the batched subscribers once at the end. Blocks can be nested, the outermost
+        one wins. The module level batch_updates() covers every observable."""
+        if not self._batch_depth:
+            self._batch = {}
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                changes, self._batch = self._batch, None
+                if changes:
+                    self._commit(changes)
 
 
 class Person(PropertyObservable):
@@ -34,7 +106,7 @@ class Person(PropertyObservable):
         if self._age == value:
             return
         self._age = value
-        self.property_changed("age", value)
+        self.notify_changed("age", value)
 
 
 class TrafficAuthority:
@@ -59,3 +131,20 @@ if __name__ == "__main__":
     for age in range(14, 20):
         print(f"Setting age to {age}")
         p.age = age
+
+    # A subscriber that only cares about the end result of a bulk update
+    p.properties_changed.append(lambda changes: print(f"Batch committed: {changes}"))
+    with p.batch_updates():
+        for age in range(20, 60):
+            p.age = age
+
+    # One batch for several people
+    q = Person(30)
+    q.properties_changed.append(lambda changes: print(f"Batch committed for q: {changes}"))
+    with batch_updates():
+        p.age = 70
+        q.age = 31
+        with p.batch_updates():
+            p.age = 71
+        q.age = 32
+        print("Nothing committed yet")
@@ -0,0 +1,188 @@
+"""
+TrafficAuthority subscribes with person.property_changed.append(self.person_changed).
+A bound method holds a reference to its object, so the Event keeps the TrafficAuthority
+alive for as long as the Person lives, even when nobody else needs it any more.
+In a long running service these forgotten observers pile up: a memory leak.
+
+WeakEvent is still an Event (a list you can call), plus:
+- subscribe(handler, weak=True) only keeps a weak reference to the handler
+  (WeakMethod for bound methods), so subscribing does not keep the observer alive.
+  Handlers whose observer is gone are skipped, and pruned from the list on the next
+  call (or subscribe, once more than half of the handlers are dead).
+- subscribe() returns a Subscription handle: close() it, or use it in a with block,
+  to unsubscribe without having to keep the handler around for remove().
+"""
+import gc
+import sys
+import tracemalloc
+import weakref
+from time import perf_counter
+
+
+class Event(list):
+    """List of functions that need to be called/invoked whenever this Event happens"""
+
+    def __call__(self, *args, **kwargs):
+        for item in self:
+            item(*args, **kwargs)
+
+
+class WeakHandler:
+    """Calls the handler while it is alive; compares equal to it, so remove() still works.
+    Careful: a weak reference to a lambda nobody else holds dies straight away."""
+
+    __slots__ = ("ref", "__weakref__")
+
+    def __init__(self, handler, on_dead):
+        if hasattr(handler, "__self__") and hasattr(handler, "__func__"):
+            self.ref = weakref.WeakMethod(handler, on_dead)
+        else:
+            self.ref = weakref.ref(handler, on_dead)
+
+    def __call__(self, *args, **kwargs):
+        handler = self.ref()
+        if handler is not None:
+            handler(*args, **kwargs)
+
+    def __eq__(self, other):
+        handler = self.ref()
+        return other is self or (handler is not None and handler == other)
+
+    def __hash__(self):
+        return id(self)
+
+
+class Subscription:
+    def __init__(self, event, entry):
+        self._event = weakref.ref(event)
+        self._entry = entry
+
+    def close(self):
+        event = self._event()
+        if event is not None and self._entry is not None:
+            for i, item in enumerate(event):
+                if item is self._entry:
+                    del event[i]
+                    break
+        self._entry = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WeakEvent(Event):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._dead = 0
+
+    def _handler_died(self, ref):
+        # Called by the garbage collector, so we only take note here and prune later
+        self._dead += 1
+
+    def subscribe(self, handler, weak=True):
+        # Events that are subscribed to a lot but rarely called still get pruned
+        if self._dead > len(self) // 2:
+            self.prune()
+        entry = WeakHandler(handler, self._handler_died) if weak else handler
+        self.append(entry)
+        return Subscription(self, entry)
+
+    def prune(self):
+        self[:] = [item for item in self if not (isinstance(item, WeakHandler) and item.ref() is None)]
+        self._dead = 0
+
+    def __call__(self, *args, **kwargs):
+        if self._dead:
+            self.prune()
+        # A copy, so handlers can unsubscribe themselves while we go through the list
+        for item in tuple(self):
+            item(*args, **kwargs)
+
+
+class PropertyObservable:
+    def __init__(self):
+        self.property_changed = WeakEvent()
+
+
+class Person(PropertyObservable):
+    def __init__(self, age=0):
+        super().__init__()
+        self._age = age
+
+    @property
+    def age(self):
+        return self._age
+
+    @age.setter
+    def age(self, value):
+        if self._age == value:
+            return
+        self._age = value
+        self.property_changed("age", value)
+
+
+class TrafficAuthority:
+    """The same observer as in PropertyObservers.py, but it does not keep itself alive"""
+
+    def __init__(self, person):
+        self.person = person
+        self.subscription = person.property_changed.subscribe(self.person_changed)
+
+    def person_changed(self, name, value):
+        if name == "age":
+            if value < 16:
+                print("Sorry, you still cannot drive")
+            else:
+                print("Okay, you can drive now")
+                self.subscription.close()
+
+
+class Observer:
+    def __init__(self, subject, weak):
+        subject.property_changed.subscribe(self.changed, weak=weak)
+
+    def changed(self, name, value):
+        pass
+
+
+def benchmark(observers=1_000_000):
+    print(f"Subscribing and dropping {observers} observers:")
+    for weak in (False, True):
+        p = Person()
+        gc.collect()
+        tracemalloc.start()
+        start = perf_counter()
+        for _ in range(observers):
+            Observer(p, weak)  # subscribed, then immediately dropped by us
+        p.age += 1  # lets the weak event prune its dead handlers
+        elapsed = perf_counter() - start
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        kind = "weak" if weak else "strong"
+        print(f" - {kind:>6} subscriptions: {memory / 2 ** 20:7.1f} MiB still in use, "
+              f"{len(p.property_changed)} handlers left, {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    p = Person()
+    ta = TrafficAuthority(p)
+    for age in range(14, 18):
+        print(f"Setting age to {age}")
+        p.age = age
+
+    p2 = Person()
+    TrafficAuthority(p2)  # nobody keeps this one, so its subscription goes away with it
+    gc.collect()
+    p2.age = 20
+    print(f"Handlers left after the authority was dropped: {len(p2.property_changed)}")
+
+    with p2.property_changed.subscribe(lambda name, value: print(f"{name} is now {value}"), weak=False):
+        p2.age = 21
+    p2.age = 22  # unsubscribed when the with block ended
+
+    # python WeakObservers.py bench [number of observers]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,202 @@
+"""
+StateMachine.py finds the next state by going through the list rules[state]
+until it finds the trigger, and it is driven one input() at a time.
+
+Here the same rules dictionary is compiled into a transition table:
+every State and every Trigger gets its ordinal (position in its Enum), and
+table[state * number_of_triggers + trigger] is the next state (or -1: not allowed).
+- fire(trigger) is a single lookup, whatever the number of rules
+- validate() finds states that can never be reached from the initial state, and
+  "dead" states from which no final state can be reached any more
+- run(triggers) / run_codes(codes) consume whole streams of triggers without input()
+"""
+import random
+import sys
+from array import array
+from time import perf_counter
+
+from StateMachine import State, Trigger, rules
+
+INVALID = -1
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class StateMachine:
+    def __init__(self, rules, initial, final_states=None, states=None, triggers=None):
+        """states and triggers default to every member of State and Trigger (their order is their ordinal),
+        final_states to the states without any outgoing transition"""
+        self.states = list(states or type(initial))
+        self.triggers = list(triggers or Trigger)
+        self.state_ordinals = {state: i for i, state in enumerate(self.states)}
+        self.trigger_ordinals = {trigger: i for i, trigger in enumerate(self.triggers)}
+        self.width = len(self.triggers)
+        self.valid_codes = bytes(range(min(self.width, 256)))
+
+        self.table = array("i", [INVALID]) * (len(self.states) * self.width)
+        for state, transitions in rules.items():
+            row = self.state_ordinals[state] * self.width
+            for trigger, target in transitions:
+                key = row + self.trigger_ordinals[trigger]
+                if self.table[key] not in (INVALID, self.state_ordinals[target]):
+                    raise ValueError(f"{state} has more than one transition for {trigger}")
+                self.table[key] = self.state_ordinals[target]
+        # Same table, but holding the row of the next state instead of its ordinal:
+        # saves a multiplication per event in the run loops
+        self._rows = array("i", (t * self.width if t != INVALID else INVALID for t in self.table))
+
+        if final_states is None:
+            final_states = [s for s in self.states if not any(self.targets(s))]
+        self.final_states = set(final_states)
+        self.initial = initial
+        self.current = self.state_ordinals[initial]
+
+    @property
+    def state(self):
+        return self.states[self.current]
+
+    def reset(self):
+        self.current = self.state_ordinals[self.initial]
+
+    def targets(self, state):
+        row = self.state_ordinals[state] * self.width
+        return [
+            (trigger, self.states[self.table[row + t]])
+            for t, trigger in enumerate(self.triggers)
+            if self.table[row + t] != INVALID
+        ]
+
+    def permitted_triggers(self):
+        return [trigger for trigger, _ in self.targets(self.state)]
+
+    def can_fire(self, trigger):
+        return self.table[self.current * self.width + self.trigger_ordinals[trigger]] != INVALID
+
+    def fire(self, trigger):
+        target = self.table[self.current * self.width + self.trigger_ordinals[trigger]]
+        if target == INVALID:
+            raise InvalidTransition(f"{trigger} is not allowed in {self.state}")
+        self.current = target
+        return self.states[target]
+
+    def run_codes(self, codes):
+        """Fire a stream of trigger ordinals (e.g. an array('B')), returns the final state"""
+        rows, width = self._rows, self.width
+        row = self.current * width
+        # An ordinal out of range would read the row of another state: bytes are checked
+        # in one go (translate() deleting every valid ordinal must leave nothing), anything else one code at a time
+        if isinstance(codes, (bytes, bytearray)) or isinstance(codes, array) and codes.typecode == "B":
+            if bytes(codes).translate(None, self.valid_codes):
+                raise ValueError(f"Trigger ordinals go from 0 to {width - 1}")
+        else:
+            codes = self._checked(codes)
+        for code in codes:
+            target = rows[row + code]
+            if target < 0:
+                self.current = row // width
+                raise InvalidTransition(f"{self.triggers[code]} is not allowed in {self.state}")
+            row = target
+        self.current = row // width
+        return self.states[self.current]
+
+    def _checked(self, codes):
+        width = self.width
+        for code in codes:
+            if not 0 <= code < width:
+                raise ValueError(f"Trigger ordinals go from 0 to {width - 1}, not {code}")
+            yield code
+
+    def encode(self, triggers):
+        return array("B", map(self.trigger_ordinals.__getitem__, triggers))
+
+    def run(self, triggers):
+        return self.run_codes(map(self.trigger_ordinals.__getitem__, triggers))
+
+    def validate(self):
+        """{"unreachable": [...], "dead": [...]} – both empty for a healthy machine"""
+        reachable = {self.initial}
+        frontier = [self.initial]
+        while frontier:
+            state = frontier.pop()
+            for _, target in self.targets(state):
+                if target not in reachable:
+                    reachable.add(target)
+                    frontier.append(target)
+
+        # Walk backwards from the final states to find who can still finish
+        can_finish = set(self.final_states)
+        changed = True
+        while changed:
+            changed = False
+            for state in self.states:
+                if state not in can_finish and any(t in can_finish for _, t in self.targets(state)):
+                    can_finish.add(state)
+                    changed = True
+
+        return {
+            "unreachable": [s for s in self.states if s not in reachable],
+            "dead": [s for s in self.states if s in reachable and s not in can_finish],
+        }
+
+
+def random_calls(machine, events, seed=42):
+    """A valid stream of triggers: a random walk, redialing whenever the phone is hung up"""
+    rng = random.Random(seed)
+    choices = {s: [machine.trigger_ordinals[t] for t, _ in machine.targets(s)] for s in machine.states}
+    codes = array("B")
+    state = machine.initial
+    for _ in range(events):
+        code = rng.choice(choices[state])
+        codes.append(code)
+        state = machine.states[machine.table[machine.state_ordinals[state] * machine.width + code]]
+    return codes
+
+
+def benchmark(events=5_000_000):
+    # Redialing after hanging up makes the machine loop forever, which a stream needs
+    looping = dict(rules)
+    looping[State.ON_HOOK] = [(Trigger.CALL_DIALED, State.CONNECTING)]
+    machine = StateMachine(looping, State.OFF_HOOK)
+    codes = random_calls(machine, events)
+
+    start = perf_counter()
+    machine.run_codes(codes)
+    elapsed = perf_counter() - start
+    print(f"{events} events in {elapsed:.2f} s: {events / elapsed / 1e6:.1f} million events per second")
+
+    triggers = [machine.triggers[c] for c in codes[:1_000_000]]
+    state = State.OFF_HOOK
+    start = perf_counter()
+    for trigger in triggers:
+        for t, s in looping[state]:
+            if t == trigger:
+                state = s
+                break
+    scan = perf_counter() - start
+    print(f"Scanning rules[state] instead: {len(triggers) / scan / 1e6:.1f} million events per second")
+
+
+if __name__ == "__main__":
+    phone = StateMachine(rules, State.OFF_HOOK)
+    print(f"Validation: {phone.validate()}")
+
+    phone.run([Trigger.CALL_DIALED, Trigger.CALL_CONNECTED, Trigger.PLACED_ON_HOLD, Trigger.TAKEN_OFF_HOLD])
+    print(f"The phone is currently {phone.state}, it could now: {phone.permitted_triggers()}")
+    print(f"Hanging up: {phone.fire(Trigger.HUNG_UP)}")
+
+    try:
+        phone.fire(Trigger.CALL_CONNECTED)
+    except InvalidTransition as error:
+        print(f"Refused: {error}")
+
+    # A rule pointing to a state that cannot get back to ON_HOOK is spotted
+    broken = dict(rules)
+    broken[State.CONNECTED] = rules[State.CONNECTED] + [(Trigger.CALL_DIALED, State.OFF_HOOK)]
+    broken[State.OFF_HOOK] = []
+    print(f"Validation of a broken machine: {StateMachine(broken, State.CONNECTED, [State.ON_HOOK]).validate()}")
+
+    # python CompiledStateMachine.py bench [number of events]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,199 @@
+"""
+The state machines here only live in memory: when the process dies, every phone session is gone.
+
+EventSourcedStateMachine is a StateMachinePool that can be rebuilt after a crash:
+- every trigger fired is appended to a binary log before it is applied:
+  session (4 bytes) + trigger ordinal (1 byte), or session ALL for fire_all()
+  Refused triggers are logged too: they do not change anything when replayed either.
+- every snapshot_every events, the whole state array is written to a snapshot file,
+  together with the size of the log at that moment (written to a temporary file first,
+  then renamed, so a crash never leaves half a snapshot behind)
+- opening it again loads the latest snapshot and only replays the end of the log.
+  A record half written when the process died is cut off.
+With durable=True, flush() also fsyncs the log: slower, but survives a power cut, not only a crash.
+"""
+import os
+import random
+import struct
+import sys
+import tempfile
+from time import perf_counter
+
+from CompiledStateMachine import StateMachine
+from StateMachine import State, Trigger, rules
+from StateMachinePool import StateMachinePool
+
+RECORD = struct.Struct("<IB")
+SNAPSHOT = struct.Struct("<QQ")  # log offset, number of sessions
+ALL = 0xFFFFFFFF
+
+
+class EventSourcedStateMachine(StateMachinePool):
+    def __init__(self, machine, path, sessions, snapshot_every=1_000_000, durable=False):
+        super().__init__(machine, sessions)
+        self.log_path = path + ".log"
+        self.snapshot_path = path + ".snapshot"
+        self.snapshot_every = snapshot_every
+        self.durable = durable
+        self.replayed = self.recover()
+        self._log = open(self.log_path, "ab")
+        self._since_snapshot = self.replayed
+
+    def recover(self):
+        """Load the snapshot and replay the log after it, returns the number of events replayed"""
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as fh:
+                offset, sessions = SNAPSHOT.unpack(fh.read(SNAPSHOT.size))
+                self.states = bytearray(fh.read(sessions))
+        if not os.path.exists(self.log_path):
+            return 0
+
+        replayed = 0
+        with open(self.log_path, "r+b") as fh:
+            fh.seek(offset)
+            chunk_size = RECORD.size * 65536
+            while True:
+                chunk = fh.read(chunk_size)
+                complete = len(chunk) - len(chunk) % RECORD.size
+                replayed += self._replay(memoryview(chunk)[:complete])
+                if len(chunk) < chunk_size:
+                    fh.truncate(fh.tell() - len(chunk) + complete)
+                    break
+        return replayed
+
+    def _replay(self, records):
+        """One event after the other: the same session may come back many times in a chunk"""
+        states, next_state, rows, columns = self.states, self._next, self._rows, self._columns
+        count = 0
+        for count, (session, code) in enumerate(RECORD.iter_unpack(records), 1):
+            if session == ALL:
+                states[:] = states.translate(columns[code])
+            else:
+                states[session] = next_state[rows[states[session]] + code]
+        return count
+
+    def _applied(self, events):
+        # Only once the events are applied: the snapshot must contain what the log before it says
+        self._since_snapshot += events
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def _check(self, sessions, codes):
+        """Before anything is logged: a record that cannot be replayed would make the log unreadable"""
+        if any(not 0 <= session < len(self.states) for session in sessions):
+            raise IndexError(f"Sessions go from 0 to {len(self.states) - 1}")
+        if any(not 0 <= code < self.width for code in codes):
+            raise ValueError(f"Trigger ordinals go from 0 to {self.width - 1}")
+
+    def fire(self, session, trigger):
+        code = self._code(trigger)
+        self._check((session,), (code,))
+        self._log.write(RECORD.pack(session, code))
+        key = self._rows[self.states[session]] + code
+        self.states[session] = self._next[key]
+        self._applied(1)
+        return not self._invalid[key]
+
+    def fire_batch(self, ids, triggers):
+        ids = list(ids)
+        codes = bytes(map(self._code, triggers))
+        self._check(ids, codes)
+        # Replay applies the records one after the other, the batch would not: both must agree
+        if len(set(ids)) != len(ids):
+            raise ValueError("A session can only appear once in a batch")
+        if len(codes) != len(ids):
+            raise ValueError("One trigger per session")
+        self._log.write(b"".join(map(RECORD.pack, ids, codes)))
+        invalid = super().fire_batch(ids, codes)
+        self._applied(len(ids))
+        return invalid
+
+    def fire_all(self, trigger):
+        code = self._code(trigger)
+        self._check((), (code,))
+        self._log.write(RECORD.pack(ALL, code))
+        invalid = super().fire_all(code)
+        self._applied(1)
+        return invalid
+
+    def flush(self):
+        self._log.flush()
+        if self.durable:
+            os.fsync(self._log.fileno())
+
+    def snapshot(self):
+        self.flush()
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "wb") as fh:
+            fh.write(SNAPSHOT.pack(self._log.tell(), len(self.states)))
+            fh.write(self.states)
+            if self.durable:
+                fh.flush()
+                os.fsync(fh.fileno())
+        os.replace(temporary, self.snapshot_path)
+        self._since_snapshot = 0
+
+    def close(self):
+        self.flush()
+        self._log.close()
+
+
+def benchmark(events=5_000_000, sessions=100_000):
+    looping = dict(rules)
+    looping[State.ON_HOOK] = [(Trigger.CALL_DIALED, State.CONNECTING)]
+    machine = StateMachine(looping, State.OFF_HOOK)
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "phones")
+        # No snapshot on the way, and one at 90% of the log
+        for name, snapshot_every in (("no snapshot", events * 2), ("snapshot at 90%", events * 9 // 10)):
+            for f in os.listdir(directory):
+                os.remove(os.path.join(directory, f))
+            pool = EventSourcedStateMachine(machine, path, sessions, snapshot_every=snapshot_every)
+            batch = 10_000
+            work = [
+                (rng.sample(range(sessions), batch), bytes(rng.randrange(machine.width) for _ in range(batch)))
+                for _ in range(events // batch)
+            ]
+            start = perf_counter()
+            for ids, codes in work:
+                pool.fire_batch(ids, codes)
+            pool.close()
+            elapsed = perf_counter() - start
+            expected = bytes(pool.states)
+
+            start = perf_counter()
+            recovered = EventSourcedStateMachine(machine, path, sessions)
+            recovery = perf_counter() - start
+            assert recovered.states == expected
+            recovered.close()
+            print(f"{name}: {events} events logged in {elapsed:.2f} s, recovered in {recovery * 1000:.0f} ms "
+                  f"({recovered.replayed} events replayed, {recovered.replayed / recovery / 1e6:.1f} million per second)")
+
+
+if __name__ == "__main__":
+    phone = StateMachine(rules, State.OFF_HOOK)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "phones")
+        pool = EventSourcedStateMachine(phone, path, 4, snapshot_every=3)
+        pool.fire_all(Trigger.CALL_DIALED)
+        pool.fire(0, Trigger.CALL_CONNECTED)
+        pool.fire_batch([1, 2], [Trigger.HUNG_UP, Trigger.CALL_CONNECTED])  # 4 events: snapshot
+        pool.fire(2, Trigger.PLACED_ON_HOLD)
+        pool.flush()
+        print(f"Before the crash: {pool.occupancy()}")
+        del pool  # no close(): as if the process had died
+
+        # A record only half written when it died
+        with open(path + ".log", "ab") as fh:
+            fh.write(RECORD.pack(3, 0)[:2])
+
+        pool = EventSourcedStateMachine(phone, path, 4)
+        print(f"After recovery ({pool.replayed} event replayed after the snapshot): {pool.occupancy()}")
+        pool.close()
+
+    # python EventSourcedStateMachine.py bench [number of events]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
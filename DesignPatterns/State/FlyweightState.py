@@ -0,0 +1,147 @@
+"""
+The light switch from ClassicImplementation.py, without its costs:
+every on()/off() there creates a new OnState()/OffState() object, whose constructor prints.
+
+Here:
+- a state has no data of its own, so each state class has one single (flyweight) instance,
+  shared by every Switch: OnState() is OnState(), and a transition allocates nothing
+- Switch uses __slots__: one pointer to its state, no __dict__
+- entry and exit hooks are optional methods of a state (enter(switch) / exit(switch)),
+  not its constructor: they run when a switch enters or leaves the state, and cost
+  nothing for the states that do not define them
+- messages go through the logging module instead of print(): below the configured level
+  they are never formatted, and a MemoryHandler can buffer the ones that are kept
+"""
+import contextlib
+import io
+import logging
+import logging.handlers
+import sys
+from time import perf_counter
+
+logger = logging.getLogger("FlyweightState")
+
+
+class State:
+    __slots__ = ()
+    enter = None
+    exit = None
+
+    def __new__(cls):
+        # cls.__dict__, not getattr: every subclass gets its own instance
+        instance = cls.__dict__.get("_instance")
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+
+    def on(self, switch):
+        logger.debug("Light is already on")
+
+    def off(self, switch):
+        logger.debug("Light is already off")
+
+
+class OnState(State):
+    __slots__ = ()
+
+    def off(self, switch):
+        logger.info("Turning light off...")
+        switch.change(OFF)
+
+
+class OffState(State):
+    __slots__ = ()
+
+    def on(self, switch):
+        logger.info("Turning light on...")
+        switch.change(ON)
+
+
+ON = OnState()
+OFF = OffState()
+
+
+class Switch:
+    __slots__ = ("state",)
+
+    def __init__(self, state=OFF):
+        self.state = state
+
+    def on(self):
+        self.state.on(self)
+
+    def off(self):
+        self.state.off(self)
+
+    def change(self, state):
+        if self.state.exit is not None:
+            self.state.exit(self)
+        self.state = state
+        if state.enter is not None:
+            state.enter(self)
+
+
+class DimmedState(OnState):
+    """A state with hooks: they replace the print() in the constructors of the classic version"""
+
+    __slots__ = ()
+
+    def enter(self, switch):
+        logger.info("Light dimmed")
+
+    def exit(self, switch):
+        logger.info("Light no longer dimmed")
+
+
+def benchmark(transitions=1_000_000):
+    import ClassicImplementation
+
+    classic = ClassicImplementation.Switch
+    with contextlib.redirect_stdout(io.StringIO()):  # printing to a terminal would be even slower
+        switch = classic()
+        start = perf_counter()
+        for _ in range(transitions // 2):
+            switch.on()
+            switch.off()
+        before = perf_counter() - start
+
+    logging.disable(logging.INFO)
+    switch = Switch()
+    start = perf_counter()
+    for _ in range(transitions // 2):
+        switch.on()
+        switch.off()
+    after = perf_counter() - start
+    logging.disable(logging.NOTSET)
+
+    print(f"{transitions} transitions:")
+    print(f" - ClassicImplementation (printing to memory): {transitions / before / 1e6:.2f} million per second")
+    print(f" - flyweight states, logging below INFO off:   {transitions / after / 1e6:.2f} million per second")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    print(f"Always the same state objects: {OnState() is ON and OffState() is OFF}")
+
+    sw = Switch()
+    sw.on()
+    sw.off()
+    sw.off()
+    sw.change(DimmedState())
+    sw.off()
+
+    # Keep the messages in memory and write them out 1000 at a time (or on a warning)
+    logger.propagate = False
+    buffer = logging.handlers.MemoryHandler(1000, logging.WARNING, logging.StreamHandler(sys.stdout))
+    logger.addHandler(buffer)
+    switches = [Switch() for _ in range(3)]
+    for s in switches:
+        s.on()
+    print("Nothing written yet, until the buffer is flushed:")
+    buffer.flush()
+
+    # python FlyweightState.py bench [number of transitions]
+    if sys.argv[1:2] == ["bench"]:
+        logger.removeHandler(buffer)
+        benchmark(*map(int, sys.argv[2:3]))
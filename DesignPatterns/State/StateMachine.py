@@ -26,24 +26,25 @@ class Trigger(Enum):
     LEFT_MESSAGE = auto()
 
 
-if __name__ == "__main__":
-    rules = {
-        State.OFF_HOOK: [(Trigger.CALL_DIALED, State.CONNECTING)],
-        State.CONNECTING: [
-            (Trigger.HUNG_UP, State.ON_HOOK),
-            (Trigger.CALL_CONNECTED, State.CONNECTED),
-        ],
-        State.CONNECTED: [
-            (Trigger.LEFT_MESSAGE, State.ON_HOOK),
-            (Trigger.HUNG_UP, State.ON_HOOK),
-            (Trigger.PLACED_ON_HOLD, State.ON_HOLD),
-        ],
-        State.ON_HOLD: [
-            (Trigger.TAKEN_OFF_HOLD, State.CONNECTED),
-            (Trigger.HUNG_UP, State.ON_HOOK),
-        ],
-    }
+rules = {
+    State.OFF_HOOK: [(Trigger.CALL_DIALED, State.CONNECTING)],
+    State.CONNECTING: [
+        (Trigger.HUNG_UP, State.ON_HOOK),
+        (Trigger.CALL_CONNECTED, State.CONNECTED),
+    ],
+    State.CONNECTED: [
+        (Trigger.LEFT_MESSAGE, State.ON_HOOK),
+        (Trigger.HUNG_UP, State.ON_HOOK),
+        (Trigger.PLACED_ON_HOLD, State.ON_HOLD),
+    ],
+    State.ON_HOLD: [
+        (Trigger.TAKEN_OFF_HOLD, State.CONNECTED),
+        (Trigger.HUNG_UP, State.ON_HOOK),
+    ],
+}
+
 
+if __name__ == "__main__":
     # Starting State
     state = State.OFF_HOOK
     # Exiting State
@@ -0,0 +1,165 @@
+"""
+Hundreds of thousands of phone sessions, all walking the same rules:
+one StateMachine object per session means one Python object and one fire() call each.
+
+StateMachinePool keeps the state of every session in a single bytearray
+(one byte per session: the ordinal of its State) and shares one compiled table.
+Without numpy, the loops are left to the C code behind the built-ins:
+- fire_all(trigger) is one bytearray.translate() through the column of the table for that trigger
+- fire_batch(ids, triggers) looks the transitions up with map() and operator functions
+- invalid transitions leave the session where it was (a self loop) and are reported in a mask
+  (one byte per event, 1 = refused), so nothing raises in the middle of a batch
+- occupancy() counts the sessions in each state with bytearray.count()
+"""
+import random
+import sys
+from collections import deque
+from operator import add
+from time import perf_counter
+
+from CompiledStateMachine import INVALID, StateMachine
+from StateMachine import State, Trigger, rules
+
+
+class StateMachinePool:
+    def __init__(self, machine, size):
+        if len(machine.states) > 256:
+            raise ValueError("A pool keeps every state in one byte: 256 states at most")
+        self.machine = machine
+        self.width = machine.width
+        self.states = bytearray([machine.state_ordinals[machine.initial]]) * size
+
+        # Invalid transitions loop back to the state they came from
+        table = machine.table
+        n = len(machine.states)
+        self._next = bytes(
+            table[key] if table[key] != INVALID else key // self.width for key in range(len(table))
+        )
+        self._invalid = bytes(table[key] == INVALID for key in range(len(table)))
+        self._rows = [state * self.width for state in range(n)]
+        # For translate(): 256 bytes per trigger, byte s = where state s goes
+        padding = bytes(range(n, 256))
+        self._columns = [
+            bytes(self._next[s * self.width + t] for s in range(n)) + padding for t in range(self.width)
+        ]
+        self._invalid_columns = [
+            bytes(self._invalid[s * self.width + t] for s in range(n)) + bytes(256 - n) for t in range(self.width)
+        ]
+
+    def __len__(self):
+        return len(self.states)
+
+    def reset(self, ids=None):
+        initial = self.machine.state_ordinals[self.machine.initial]
+        if ids is None:
+            self.states = bytearray([initial]) * len(self.states)
+        else:
+            for i in ids:
+                self.states[i] = initial
+
+    def _code(self, trigger):
+        if not isinstance(trigger, int):
+            return self.machine.trigger_ordinals[trigger]
+        if not 0 <= trigger < self.width:
+            raise ValueError(f"Trigger ordinals go from 0 to {self.width - 1}, not {trigger}")
+        return trigger
+
+    def fire_all(self, trigger):
+        """Fire the same trigger in every session, returns the mask of the ones that refused it"""
+        code = self._code(trigger)
+        invalid = self.states.translate(self._invalid_columns[code])
+        self.states = self.states.translate(self._columns[code])
+        return invalid
+
+    def fire_batch(self, ids, triggers):
+        """triggers[i] is fired in session ids[i] (Trigger members or their ordinals).
+        A session can appear at most once per batch (ValueError otherwise): all lookups
+        use the states from before the batch, so a second transition would overwrite the
+        first. Returns the mask of refused transitions, in the order of ids."""
+        states = self.states
+        if not isinstance(ids, (list, tuple, range)):
+            ids = list(ids)
+        if isinstance(triggers, (bytes, bytearray)):
+            # An ordinal out of range would read the row of another state
+            if triggers.translate(None, self.machine.valid_codes):
+                raise ValueError(f"Trigger ordinals go from 0 to {self.width - 1}")
+            codes = triggers
+        else:
+            codes = list(map(self._code, triggers))
+        if len(codes) != len(ids):
+            raise ValueError("One trigger per session")
+        if len(set(ids)) != len(ids):
+            raise ValueError("A session can only appear once in a batch")
+        keys = list(map(add, map(self._rows.__getitem__, map(states.__getitem__, ids)), codes))
+        # deque(..., maxlen=0) runs the map without keeping anything, like a for loop written in C
+        deque(map(states.__setitem__, ids, map(self._next.__getitem__, keys)), maxlen=0)
+        return bytes(map(self._invalid.__getitem__, keys))
+
+    def state_of(self, i):
+        return self.machine.states[self.states[i]]
+
+    def occupancy(self):
+        """{State: number of sessions in it}"""
+        return {state: self.states.count(i) for i, state in enumerate(self.machine.states)}
+
+
+def benchmark(sessions=500_000, batches=10):
+    looping = dict(rules)
+    looping[State.ON_HOOK] = [(Trigger.CALL_DIALED, State.CONNECTING)]
+    machine = StateMachine(looping, State.OFF_HOOK)
+    rng = random.Random(42)
+    ids = list(range(sessions))
+    work = []
+    for _ in range(batches):
+        rng.shuffle(ids)
+        work.append((ids[: sessions // 2], bytes(rng.randrange(machine.width) for _ in range(sessions // 2))))
+
+    pool = StateMachinePool(machine, sessions)
+    start = perf_counter()
+    refused = sum(pool.fire_batch(batch, codes).count(1) for batch, codes in work)
+    elapsed = perf_counter() - start
+    events = batches * (sessions // 2)
+    print(f"fire_batch: {events} events in {elapsed:.2f} s ({events / elapsed / 1e6:.1f} M/s), {refused} refused")
+
+    start = perf_counter()
+    for code in range(machine.width):
+        pool.fire_all(code)
+    elapsed = perf_counter() - start
+    print(f"fire_all: {machine.width * sessions} events in {elapsed * 1000:.1f} ms")
+
+    start = perf_counter()
+    pool.occupancy()
+    print(f"occupancy: {(perf_counter() - start) * 1000:.1f} ms")
+
+    # One object per session, one call per event
+    machines = [StateMachine(looping, State.OFF_HOOK) for _ in range(sessions)]
+    triggers = machine.triggers
+    start = perf_counter()
+    for batch, codes in work:
+        for i, code in zip(batch, codes):
+            m = machines[i]
+            trigger = triggers[code]
+            if m.can_fire(trigger):
+                m.fire(trigger)
+    elapsed = perf_counter() - start
+    print(f"One StateMachine per session: {events / elapsed / 1e6:.1f} M/s")
+
+
+if __name__ == "__main__":
+    phone = StateMachine(rules, State.OFF_HOOK)
+    pool = StateMachinePool(phone, 10)
+
+    print(f"Everybody dials, refused: {list(pool.fire_all(Trigger.CALL_DIALED))}")
+    refused = pool.fire_batch(
+        [0, 1, 2, 3],
+        [Trigger.CALL_CONNECTED, Trigger.HUNG_UP, Trigger.CALL_CONNECTED, Trigger.TAKEN_OFF_HOLD],
+    )
+    print(f"Sessions 0-3, refused: {list(refused)}")
+    print(f"Session 3 is still {pool.state_of(3)}")
+    pool.fire_batch([0, 2], [Trigger.PLACED_ON_HOLD, Trigger.LEFT_MESSAGE])
+    for state, sessions in pool.occupancy().items():
+        print(f"{state}: {sessions}")
+
+    # python StateMachinePool.py bench [number of sessions]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
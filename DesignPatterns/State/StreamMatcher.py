@@ -0,0 +1,159 @@
+"""
+SwitchBasedSM.py builds up entry += input(entry) and checks code.startswith(entry)
+on every keystroke: O(len(entry)) per key, and for a single code.
+
+StreamMatcher compiles one or many codes into a DFA (Aho-Corasick):
+- a trie of the codes, where every node is "what has been typed so far"
+- failure links (the longest suffix of what was typed that is also a prefix of some code),
+  folded into the transitions, so every symbol is one dict lookup, O(1), never a step back
+feed(chunk) processes keystrokes (str) or bytes in chunks of any size and keeps its state
+between chunks, so a code split over two chunks is still found.
+
+on_match(code, end) is called for every code found, end being the position right after it in the stream.
+With anchored=True the matcher behaves like the vault: the codes must be typed from the
+start, a wrong symbol calls on_failure(entry, symbol, position) and resets the entry.
+"""
+import random
+import sys
+from collections import deque
+from time import perf_counter
+
+
+class StreamMatcher:
+    ROOT = 0
+    FAILED = -1
+
+    def __init__(self, codes, on_match=None, on_failure=None, anchored=False):
+        self.codes = list(codes)
+        if not self.codes or not all(self.codes):
+            raise ValueError("Need at least one code, and codes cannot be empty")
+        self.on_match = on_match
+        self.on_failure = on_failure
+        self.anchored = anchored
+
+        # The trie: one dict symbol -> node per node
+        self._delta = [{}]
+        self._prefix = [self.codes[0][:0]]
+        self._outputs = [()]
+        for code in self.codes:
+            node = self.ROOT
+            for i, symbol in enumerate(code):
+                target = self._delta[node].get(symbol)
+                if target is None:
+                    target = len(self._delta)
+                    self._delta[node][symbol] = target
+                    self._delta.append({})
+                    self._prefix.append(code[: i + 1])
+                    self._outputs.append(())
+                node = target
+            if code not in self._outputs[node]:
+                self._outputs[node] += (code,)
+
+        if not anchored:
+            self._follow_failure_links()
+        self.reset()
+
+    def _follow_failure_links(self):
+        """Breadth first, so the failure node of a node (always shallower) is complete before the node itself"""
+        delta, outputs = self._delta, self._outputs
+        fail = [self.ROOT] * len(delta)
+        queue = deque(delta[self.ROOT].values())
+        while queue:
+            node = queue.popleft()
+            # Only trie edges in delta[node] at this point: it is completed below
+            for symbol, child in delta[node].items():
+                fail[child] = delta[fail[node]].get(symbol, self.ROOT) if node != self.ROOT else self.ROOT
+                # A code ending inside another one ("34" in "1234") is found too
+                outputs[child] += tuple(c for c in outputs[fail[child]] if c not in outputs[child])
+                queue.append(child)
+            for symbol, target in delta[fail[node]].items():
+                delta[node].setdefault(symbol, target)
+
+    @property
+    def entry(self):
+        """What has been typed so far, as far as the codes are concerned"""
+        return self._prefix[self.state]
+
+    def reset(self):
+        self.state = self.ROOT
+        self.position = 0
+
+    def feed(self, chunk):
+        """Returns the number of matches in this chunk"""
+        delta, outputs = self._delta, self._outputs
+        on_match = self.on_match
+        state = self.state
+        matches = 0
+        failed = self.FAILED
+        fallback = failed if self.anchored else self.ROOT
+        position = self.position
+        for position, symbol in enumerate(chunk, self.position + 1):
+            next_state = delta[state].get(symbol, fallback)
+            if next_state == failed:
+                if self.on_failure is not None:
+                    self.on_failure(self._prefix[state], symbol, position - 1)
+                state = self.ROOT
+                continue
+            state = next_state
+            if outputs[state]:
+                matches += len(outputs[state])
+                if on_match is not None:
+                    for code in outputs[state]:
+                        on_match(code, position)
+                # Unlocked: nothing longer can follow, so start over
+                if self.anchored and not delta[state]:
+                    state = self.ROOT
+        self.state = state
+        self.position = position
+        return matches
+
+
+def benchmark(size=5_000_000, codes=1000):
+    rng = random.Random(42)
+    secrets = list({"".join(rng.choices("0123456789", k=6)) for _ in range(codes)})
+    stream = "".join(rng.choices("0123456789", k=size))
+
+    matcher = StreamMatcher(secrets)
+    start = perf_counter()
+    found = sum(matcher.feed(stream[i:i + 65536]) for i in range(0, size, 65536))
+    elapsed = perf_counter() - start
+    print(f"{len(secrets)} codes, {size} symbols: {found} matches in {elapsed:.2f} s, "
+          f"{size / elapsed / 1e6:.1f} million symbols per second")
+
+    # The vault way, for a single code: startswith() on the entry after every key
+    code, entry, failures = secrets[0], "", 0
+    start = perf_counter()
+    for key in stream[:1_000_000]:
+        entry += key
+        if not code.startswith(entry):
+            entry = ""
+            failures += 1
+        elif entry == code:
+            entry = ""
+    elapsed = perf_counter() - start
+    print(f"startswith, one code only: {1_000_000 / elapsed / 1e6:.1f} million symbols per second "
+          f"(and one more startswith per key for every extra code)")
+
+
+if __name__ == "__main__":
+    # The vault from SwitchBasedSM.py, fed keystrokes instead of input()
+    vault = StreamMatcher(
+        ["1234"],
+        on_match=lambda code, end: print("UNLOCKED"),
+        on_failure=lambda entry, key, position: print(f"FAILED after {entry!r} + {key!r}"),
+        anchored=True,
+    )
+    for keys in ["12", "5", "1", "23", "4"]:
+        vault.feed(keys)
+
+    # Many codes anywhere in a byte stream, even across chunk boundaries
+    scanner = StreamMatcher(
+        [b"he", b"she", b"his", b"hers"],
+        on_match=lambda code, end: print(f"{code!r} ending at {end}"),
+    )
+    for chunk in [b"ushe", b"rs his", b"tory"]:
+        scanner.feed(chunk)
+
+    # python StreamMatcher.py bench [number of symbols]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -55,15 +55,16 @@ class Research:
             print(f"John has a child called {p}")
 
 
-parent = Person("John")
-child1 = Person("Chris")
-child2 = Person("Matt")
+if __name__ == "__main__":
+    parent = Person("John")
+    child1 = Person("Chris")
+    child2 = Person("Matt")
 
-Relationships = Relationships()
-Relationships.add_parent_and_child(parent, child1)
-Relationships.add_parent_and_child(parent, child2)
+    Relationships = Relationships()
+    Relationships.add_parent_and_child(parent, child1)
+    Relationships.add_parent_and_child(parent, child2)
 
-Research(Relationships)
+    Research(Relationships)
 
 # What was the problem, and how we fixed it -->
 
@@ -0,0 +1,262 @@
+# Dependency Inversion Principle, part 2: swapping the low level module
+
+# Research only depends on the RelationshipBrowser abstraction, so we can replace
+# the list of (person, relationship, person) tuples with something much faster
+# and Research does not change at all. That is the whole point of the DIP.
+
+# Relationships.find_all_children_of() looks at every relation ever added, for every query.
+# RelationshipGraph is an adjacency index instead:
+#   - every distinct name is interned and gets a small integer id
+#   - for every Relationship there is a list, indexed by id, of neighbour ids
+# so a query only touches the people in its answer (plus the ones it passes through).
+
+# For big datasets there is also a bulk API:
+#   - add_edges() loads many (parent, child) pairs in one pass
+#   - find_all_children_of_many() answers many names in one call
+#   - traverse() walks the graph and hands back whole batches of people at a time
+
+import sys
+from collections import deque
+from time import perf_counter
+
+from DIP import Person, Relationship, RelationshipBrowser, Relationships, Research
+
+
+class RelationshipGraph(RelationshipBrowser):
+    def __init__(self):
+        self.ids = {}  # name -> id
+        self.names = []  # id -> name
+        # Relationship -> one entry per id: None, or the list of neighbour ids
+        self.edges = {relationship: [] for relationship in Relationship}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _id(self, name):
+        node = self.ids.get(name)
+        if node is None:
+            name = sys.intern(name)
+            node = self.ids[name] = len(self.names)
+            self.names.append(name)
+            for neighbours in self.edges.values():
+                neighbours.append(None)
+        return node
+
+    def _link(self, relationship, source, target):
+        neighbours = self.edges[relationship]
+        if neighbours[source] is None:
+            neighbours[source] = [target]
+        else:
+            neighbours[source].append(target)
+
+    def _neighbours(self, relationship, node):
+        return self.edges[relationship][node] or ()
+
+    def add_parent_and_child(self, parent, child):
+        p, c = self._id(parent.name), self._id(child.name)
+        self._link(Relationship.PARENT, p, c)
+        self._link(Relationship.CHILD, c, p)
+
+    def add_edges(self, edges):
+        """Bulk version of add_parent_and_child: (parent, child) pairs of Persons or names"""
+        ids, new_id = self.ids, self._id
+        children = self.edges[Relationship.PARENT]
+        parents = self.edges[Relationship.CHILD]
+        for parent, child in edges:
+            if not isinstance(parent, str):
+                parent = parent.name
+            if not isinstance(child, str):
+                child = child.name
+            p = ids.get(parent)
+            if p is None:
+                p = new_id(parent)
+            c = ids.get(child)
+            if c is None:
+                c = new_id(child)
+            if children[p] is None:
+                children[p] = [c]
+            else:
+                children[p].append(c)
+            if parents[c] is None:
+                parents[c] = [p]
+            else:
+                parents[c].append(p)
+
+    # --- queries, all by name like the original one ---
+
+    def find_all_children_of(self, name):
+        node = self.ids.get(name)
+        if node is not None:
+            names = self.names
+            for child in self._neighbours(Relationship.PARENT, node):
+                yield names[child]
+
+    def find_all_children_of_many(self, names):
+        """{name: [children]} for every name, in one call"""
+        ids, labels = self.ids, self.names
+        children = self.edges[Relationship.PARENT]
+        result = {}
+        for name in names:
+            node = ids.get(name)
+            found = children[node] if node is not None else None
+            result[name] = [labels[child] for child in found] if found else []
+        return result
+
+    def find_all_parents_of(self, name):
+        node = self.ids.get(name)
+        if node is not None:
+            names = self.names
+            for parent in self._neighbours(Relationship.CHILD, node):
+                yield names[parent]
+
+    def find_siblings_of(self, name):
+        """Everyone sharing at least one parent, each of them once"""
+        node = self.ids.get(name)
+        if node is None:
+            return
+        seen = {node}
+        for parent in self._neighbours(Relationship.CHILD, node):
+            for sibling in self._neighbours(Relationship.PARENT, parent):
+                if sibling not in seen:
+                    seen.add(sibling)
+                    yield self.names[sibling]
+
+    def _walk(self, relationship, name, max_depth):
+        """Breadth first, nearest generation first, each person once"""
+        node = self.ids.get(name)
+        if node is None:
+            return
+        seen = {node}
+        queue = deque([(node, 0)])
+        while queue:
+            node, depth = queue.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for other in self._neighbours(relationship, node):
+                if other not in seen:
+                    seen.add(other)
+                    yield self.names[other]
+                    queue.append((other, depth + 1))
+
+    def traverse(self, names, relationship=Relationship.PARENT, order="bfs", max_depth=None, batch_size=1024):
+        """Walk from `names` along `relationship`, yielding lists of names.
+        order="bfs" yields one generation (frontier) per batch, nearest first.
+        order="dfs" yields up to batch_size names per batch, in depth first order."""
+        neighbours = self.edges[relationship]
+        labels = self.names
+        start = [self.ids[name] for name in names if name in self.ids]
+        seen = set(start)
+
+        if order == "bfs":
+            frontier, depth = start, 0
+            while frontier and (max_depth is None or depth < max_depth):
+                next_frontier = []
+                for node in frontier:
+                    for other in neighbours[node] or ():
+                        if other not in seen:
+                            seen.add(other)
+                            next_frontier.append(other)
+                if next_frontier:
+                    yield [labels[node] for node in next_frontier]
+                frontier, depth = next_frontier, depth + 1
+        elif order == "dfs":
+            stack = [(node, 0) for node in reversed(start)]
+            batch = []
+            while stack:
+                node, depth = stack.pop()
+                if max_depth is None or depth < max_depth:
+                    for other in reversed(neighbours[node] or ()):
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append((other, depth + 1))
+                if depth:
+                    batch.append(labels[node])
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
+        else:
+            raise ValueError(f"order must be 'bfs' or 'dfs', not {order!r}")
+
+    def find_all_descendants_of(self, name, max_depth=None):
+        return self._walk(Relationship.PARENT, name, max_depth)
+
+    def find_ancestors_of(self, name, max_depth=None):
+        """max_depth=1 are the parents, 2 adds the grandparents, and so on"""
+        return self._walk(Relationship.CHILD, name, max_depth)
+
+
+def family_tree(edges, fanout=3):
+    """A synthetic family: person i is a child of person (i - 1) // fanout"""
+    return ((f"person{(i - 1) // fanout}", f"person{i}") for i in range(1, edges + 1))
+
+
+def benchmark(edges=10_000_000, scan_edges=1_000_000, queries=20):
+    """The list scan is linear, so it is measured on at most `scan_edges` edges
+    (10M of them would need several GB just for the tuples)"""
+    scan_edges = min(edges, scan_edges)
+    names = [f"person{i * 7919 % (scan_edges // 3)}" for i in range(queries)]
+
+    people = {}
+    start = perf_counter()
+    relationships = Relationships()
+    for parent, child in family_tree(scan_edges):
+        p = people.get(parent) or people.setdefault(parent, Person(parent))
+        c = people.get(child) or people.setdefault(child, Person(child))
+        relationships.add_parent_and_child(p, c)
+    scan_load = perf_counter() - start
+    start = perf_counter()
+    expected = {name: list(relationships.find_all_children_of(name)) for name in names}
+    scan_query = (perf_counter() - start) / queries
+    del people, relationships
+
+    graph = RelationshipGraph()
+    start = perf_counter()
+    graph.add_edges(family_tree(edges))
+    graph_load = perf_counter() - start
+    start = perf_counter()
+    got = graph.find_all_children_of_many(names)
+    graph_query = (perf_counter() - start) / queries
+    assert got == expected
+
+    start = perf_counter()
+    generations = sum(1 for _ in graph.traverse(["person0"]))
+    walk = perf_counter() - start
+
+    print(f"Family tree, {edges} edges ({scan_edges} for the list scan):")
+    print(f" - Relationships load:         {scan_load:8.2f} s")
+    print(f" - RelationshipGraph load:     {graph_load:8.2f} s")
+    print(f" - list scan, per query:       {scan_query * 1e3:10.3f} ms")
+    print(f" - graph lookup, per query:    {graph_query * 1e3:10.3f} ms")
+    print(f" - BFS over everyone:          {walk:8.2f} s ({generations} generations)")
+
+
+if __name__ == "__main__":
+    john = Person("John")
+    chris = Person("Chris")
+    matt = Person("Matt")
+    ann = Person("Ann")
+
+    graph = RelationshipGraph()
+    graph.add_parent_and_child(john, chris)
+    graph.add_parent_and_child(john, matt)
+    graph.add_parent_and_child(chris, ann)
+
+    # Same high level module, different low level module
+    Research(graph)
+
+    print(f"Descendants of John: {list(graph.find_all_descendants_of('John'))}")
+    print(f"Siblings of Matt: {list(graph.find_siblings_of('Matt'))}")
+    print(f"Parents of Ann: {list(graph.find_ancestors_of('Ann', max_depth=1))}")
+    print(f"Ancestors of Ann: {list(graph.find_ancestors_of('Ann'))}")
+
+    graph.add_edges([("Ann", "Bob"), ("Ann", "Eve"), ("Matt", "Zoe")])
+    print(f"Children of many: {graph.find_all_children_of_many(['John', 'Ann', 'Nobody'])}")
+    for generation in graph.traverse(["John"]):
+        print(f"Next generation: {generation}")
+    print(f"Depth first: {list(graph.traverse(['John'], order='dfs'))}")
+
+    # python DIPGraph.py bench [number of edges]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,147 @@
+# Open-Closed Principle, part 4: remembering filter results
+
+# A dashboard asks for "large & blue" every few seconds, and the products
+# hardly ever change. Scanning them again each time is wasted work.
+
+# CachedFilter wraps any other Filter (again: extension, not modification).
+# A result can be reused only if nothing it depends on has changed, so the key is:
+#   - the canonical key of the specification tree (blue & large == large & blue)
+#   - the collection, which must be a ProductCatalog: a list that counts its changes
+#   - Product.version, which counts changes made to any product
+# Least recently used entries are evicted once there are more than `maxsize`.
+
+import sys
+from collections import OrderedDict
+from timeit import timeit
+
+from OCPPlanner import canonical_key
+from OCPrinciple import (
+    BetterFilter,
+    Color,
+    ColorSpecification,
+    Filter,
+    Product,
+    Size,
+    SizeSpecification,
+)
+
+
+class ProductCatalog(list):
+    """A list of products with a version number that goes up on every change"""
+
+    version = 0
+
+
+def _bump_version(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__setitem__", "__delitem__", "__iadd__", "__imul__",
+    "append", "extend", "insert", "remove", "pop", "clear", "sort", "reverse",
+):
+    setattr(ProductCatalog, _name, _bump_version(_name))
+
+
+class CachedFilter(Filter):
+    """Same generator API and results as the wrapped filter. Results are only
+    cached for a ProductCatalog and a specification with a canonical key,
+    everything else goes straight to the wrapped filter."""
+
+    def __init__(self, inner=None, maxsize=128):
+        self.inner = inner or BetterFilter()
+        self.maxsize = maxsize
+        # (spec key, id(catalog)) -> (catalog, catalog version, Product.version, results)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def filter(self, items, spec):
+        spec_key = canonical_key(spec)
+        if spec_key is None or not isinstance(items, ProductCatalog):
+            yield from self.inner.filter(items, spec)
+            return
+
+        key = (spec_key, id(items))
+        entry = self._entries.get(key)
+        # Keeping a reference to the catalog in the entry means its id() cannot be reused
+        if entry is not None and entry[0] is items and entry[1:3] == (items.version, Product.version):
+            self.hits += 1
+            self._entries.move_to_end(key)
+            yield from entry[3]
+            return
+
+        self.misses += 1
+        version = (items.version, Product.version)
+        results = tuple(self.inner.filter(items, spec))
+        self._entries[key] = (items, *version, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        yield from results
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+def benchmark(n=200_000, queries=50):
+    colors, sizes = list(Color), list(Size)
+    catalog = ProductCatalog(Product(f"p{i}", colors[i % 3], sizes[i // 3 % 3]) for i in range(n))
+    specs = [ColorSpecification(c) & SizeSpecification(s) for c in colors for s in sizes]
+
+    def dashboard(f):
+        for i in range(queries):
+            list(f.filter(catalog, specs[i % len(specs)]))
+
+    cached = CachedFilter(maxsize=16)
+    plain = timeit(lambda: dashboard(BetterFilter()), number=1)
+    warm = timeit(lambda: dashboard(cached), number=1)
+    print(f"{queries} dashboard queries over {n} products:")
+    print(f" - BetterFilter: {plain * 1000:.1f} ms")
+    print(f" - CachedFilter: {warm * 1000:.1f} ms ({plain / warm:.1f}x) {cached.stats()}")
+
+
+if __name__ == "__main__":
+    apple = Product("Apple", Color.GREEN, Size.SMALL)
+    tree = Product("Tree", Color.GREEN, Size.LARGE)
+    house = Product("House", Color.BLUE, Size.LARGE)
+    products = ProductCatalog([apple, tree, house])
+
+    cf = CachedFilter(maxsize=2)
+    large_blue = SizeSpecification(Size.LARGE) & ColorSpecification(Color.BLUE)
+    blue_large = ColorSpecification(Color.BLUE) & SizeSpecification(Size.LARGE)
+
+    print("Large blue items:", [p.name for p in cf.filter(products, large_blue)])
+    print("Blue large items (cached):", [p.name for p in cf.filter(products, blue_large)])
+
+    tree.color = Color.BLUE  # changing a product makes the cached result stale
+    print("After painting the tree:", [p.name for p in cf.filter(products, large_blue)])
+
+    products.append(Product("Ocean", Color.BLUE, Size.LARGE))  # and so does changing the catalog
+    print("After adding the ocean:", [p.name for p in cf.filter(products, large_blue)])
+
+    print("Green items:", [p.name for p in cf.filter(products, ColorSpecification(Color.GREEN))])
+    print("Small items:", [p.name for p in cf.filter(products, SizeSpecification(Size.SMALL))])
+    print(cf.stats())
+
+    # python OCPCache.py bench [number of products]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,210 @@
+# Open-Closed Principle, part 2: a columnar product index
+
+# BetterFilter asks every single Product "do you satisfy this specification?".
+# That is fine for three products, but with millions of them almost all the time
+# is spent calling is_satisfied() through the interpreter, one item at a time.
+
+# Instead of modifying BetterFilter (which would break the OCP), we extend
+# Filter with an IndexedFilter that understands a ProductIndex:
+#   - every enum column (color, size) is stored as a packed array of codes
+#   - every (column, value) pair gets a bitmap with one bit per product
+#   - a Specification tree is "compiled" into bitwise operations on those bitmaps,
+#     which Python runs on big integers in C, many products at a time.
+
+import sys
+from timeit import timeit
+
+from OCPrinciple import (
+    AndSpecification,
+    BetterFilter,
+    Color,
+    ColorSpecification,
+    Filter,
+    NotSpecification,
+    OrSpecification,
+    Product,
+    Size,
+    SizeSpecification,
+)
+
+
+class ProductIndex:
+    """Column store of products: every enum column (color, size) is a packed array
+    with one byte per product, the code of its value. The bitmap of a value is
+    built from that array on demand, and kept until a product with that value is added.
+    Names are (nearly) unique and no specification looks at them: they are not indexed.
+    Products changed after being added (Product.version moved on) are noticed:
+    the next query indexes every product again before answering."""
+
+    columns = ("color", "size")
+
+    def __init__(self, products=()):
+        self.products = []
+        # column -> list of distinct values, the position in the list is the code
+        self.values = {column: [] for column in self.columns}
+        self._codes = {column: {} for column in self.columns}
+        self.codes = {column: bytearray() for column in self.columns}
+        # (column, value) -> int with one bit per product
+        self._bitmaps = {}
+        self.version = Product.version
+        for product in products:
+            self.add(product)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def add(self, product):
+        self._refresh()
+        self.products.append(product)
+        self._index(product)
+
+    def _index(self, product):
+        for column in self.columns:
+            value = getattr(product, column)
+            codes = self._codes[column]
+            code = codes.get(value)
+            if code is None:
+                if len(codes) == 256:
+                    raise ValueError(f"More than 256 distinct values of {column}: it is not an enum")
+                code = codes[value] = len(self.values[column])
+                self.values[column].append(value)
+            self.codes[column].append(code)
+            self._bitmaps.pop((column, value), None)
+
+    def _refresh(self):
+        """Index everything again if any product was changed since the last time"""
+        if self.version == Product.version:
+            return
+        for column in self.columns:
+            self.values[column].clear()
+            self._codes[column].clear()
+            self.codes[column].clear()
+        self._bitmaps.clear()
+        for product in self.products:
+            self._index(product)
+        self.version = Product.version
+
+    def bitmap(self, column, value):
+        """All the rows where column == value, as an int (bit i set = row i matches)"""
+        key = (column, value)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            code = self._codes[column].get(value)
+            if code is None:
+                bitmap = 0
+            else:
+                # One translate() turns the codes into "0"/"1" digits, row 0 last: int(..., 2) packs them
+                digits = bytearray(b"0" * 256)
+                digits[code] = ord("1")
+                bitmap = int(self.codes[column].translate(digits)[::-1] or b"0", 2)
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    @property
+    def all_rows(self):
+        return (1 << len(self.products)) - 1
+
+    def compile(self, spec):
+        """Turn a specification tree into a bitmap of matching rows.
+        Only the exact built-in classes are compiled: a subclass may override
+        is_satisfied(), so it is evaluated the slow (but correct) way."""
+        self._refresh()
+        kind = type(spec)
+        if kind is ColorSpecification:
+            return self.bitmap("color", spec.color)
+        if kind is SizeSpecification:
+            return self.bitmap("size", spec.size)
+        if kind is AndSpecification:
+            result = self.all_rows
+            for arg in spec.args:
+                if not result:
+                    break
+                result &= self.compile(arg)
+            return result
+        if kind is OrSpecification:
+            result = 0
+            everything = self.all_rows
+            for arg in spec.args:
+                if result == everything:
+                    break
+                result |= self.compile(arg)
+            return result
+        if kind is NotSpecification:
+            return self.all_rows & ~self.compile(spec.spec)
+        return self.scan(spec)
+
+    def scan(self, spec):
+        """Fallback for specifications the index does not know about"""
+        bitset = bytearray(len(self.products) // 8 + 1)
+        for row, product in enumerate(self.products):
+            if spec.is_satisfied(product):
+                bitset[row // 8] |= 1 << (row % 8)
+        return int.from_bytes(bitset, "little")
+
+    def query(self, spec):
+        products = self.products
+        for row in rows_of(self.compile(spec)):
+            yield products[row]
+
+
+def rows_of(bitmap):
+    """Positions of the set bits, lowest first, so results keep the insertion order"""
+    bits = format(bitmap, "b")[::-1]
+    row = bits.find("1")
+    while row != -1:
+        yield row
+        row = bits.find("1", row + 1)
+
+
+class IndexedFilter(Filter):
+    """Same generator API as BetterFilter, same results in the same order,
+    but a ProductIndex is answered with bitmaps instead of a full scan."""
+
+    def filter(self, items, spec):
+        if isinstance(items, ProductIndex):
+            yield from items.query(spec)
+        else:
+            yield from BetterFilter().filter(items, spec)
+
+
+def benchmark(n=1_000_000):
+    colors, sizes = list(Color), list(Size)
+    products = [Product(f"p{i}", colors[i % 3], sizes[i // 3 % 3]) for i in range(n)]
+    index = ProductIndex(products)
+    spec = SizeSpecification(Size.LARGE) & ColorSpecification(Color.BLUE)
+
+    assert list(BetterFilter().filter(products, spec)) == list(IndexedFilter().filter(index, spec))
+
+    scan = timeit(lambda: list(BetterFilter().filter(products, spec)), number=3) / 3
+    indexed = timeit(lambda: list(IndexedFilter().filter(index, spec)), number=3) / 3
+    print(f"{n} products, large & blue:")
+    print(f" - BetterFilter:  {scan * 1000:.1f} ms")
+    print(f" - IndexedFilter: {indexed * 1000:.1f} ms ({scan / indexed:.1f}x)")
+
+
+if __name__ == "__main__":
+    apple = Product("Apple", Color.GREEN, Size.SMALL)
+    tree = Product("Tree", Color.GREEN, Size.LARGE)
+    house = Product("House", Color.BLUE, Size.LARGE)
+
+    index = ProductIndex([apple, tree, house])
+    f = IndexedFilter()
+
+    print("Green products (indexed):")
+    for p in f.filter(index, ColorSpecification(Color.GREEN)):
+        print(f" - {p.name} is green")
+
+    print("Large blue items (indexed):")
+    for p in f.filter(index, SizeSpecification(Size.LARGE) & ColorSpecification(Color.BLUE)):
+        print(f" - {p.name} is large and blue")
+
+    print("Small or not green items (indexed):")
+    for p in f.filter(index, SizeSpecification(Size.SMALL) | ~ColorSpecification(Color.GREEN)):
+        print(f" - {p.name} is small or not green")
+
+    # python OCPIndex.py bench [number of products]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
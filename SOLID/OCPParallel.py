@@ -0,0 +1,155 @@
+# Open-Closed Principle, part 5: filtering on many cores
+
+# Specifications are plain objects (enum members, tuples of other specifications),
+# so they can be pickled and sent to other processes together with a chunk of items.
+# ParallelFilter is one more Filter: it splits the items into chunks, lets a process pool
+# check them, and yields the matching items back as results arrive.
+
+#   - ordered=True yields in input order (the same order as BetterFilter),
+#     ordered=False yields each chunk as soon as it is done.
+#   - at most `max_pending` chunks are in flight, and `items` is only read as far as
+#     needed to keep them busy (back-pressure), so it can be a generator.
+#   - if the consumer stops iterating early, chunks that have not started are cancelled.
+
+# Sending products to another process is not free, so this only pays off for big
+# catalogs and/or expensive specifications: run `python OCPParallel.py bench` to see where.
+
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from time import perf_counter
+
+from OCPPlanner import SlowSpecification
+from OCPrinciple import (
+    BetterFilter,
+    Color,
+    ColorSpecification,
+    Filter,
+    Product,
+    Size,
+    SizeSpecification,
+)
+
+
+def _matching_positions(spec, chunk):
+    """Runs in the worker: only positions travel back, the parent already has the items"""
+    return [i for i, item in enumerate(chunk) if spec.is_satisfied(item)]
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelFilter(Filter):
+    def __init__(self, executor=None, max_workers=None, chunk_size=20_000, max_pending=None, ordered=True):
+        """Pass an executor to share one pool between calls, otherwise every
+        call to filter() starts (and shuts down) a pool of its own."""
+        self.executor = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * self.max_workers
+        self.ordered = ordered
+
+    def filter(self, items, spec):
+        executor = self.executor or ProcessPoolExecutor(self.max_workers)
+        chunks = _chunks(items, self.chunk_size)
+        pending = {}  # future -> chunk
+        try:
+            if self.ordered:
+                yield from self._in_order(executor, chunks, spec, pending)
+            else:
+                yield from self._as_completed(executor, chunks, spec, pending)
+        finally:
+            for future in pending:
+                future.cancel()
+            if executor is not self.executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, executor, chunks, spec, pending):
+        """Top up the pool to max_pending chunks, returns False once items run out"""
+        while len(pending) < self.max_pending:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            pending[executor.submit(_matching_positions, spec, chunk)] = chunk
+        return True
+
+    def _in_order(self, executor, chunks, spec, pending):
+        queue = deque()
+        more = True
+        while True:
+            if more:
+                before = set(pending)
+                more = self._submit(executor, chunks, spec, pending)
+                queue.extend(future for future in pending if future not in before)
+            if not queue:
+                return
+            future = queue.popleft()
+            positions = future.result()
+            chunk = pending.pop(future)
+            for i in positions:
+                yield chunk[i]
+
+    def _as_completed(self, executor, chunks, spec, pending):
+        more = True
+        while True:
+            if more:
+                more = self._submit(executor, chunks, spec, pending)
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = pending.pop(future)
+                for i in future.result():
+                    yield chunk[i]
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000)):
+    colors, sizes_ = list(Color), list(Size)
+    cheap = SizeSpecification(Size.LARGE) & ColorSpecification(Color.BLUE)
+    expensive = SlowSpecification(cheap, work=200)
+
+    with ProcessPoolExecutor() as executor:
+        pf = ParallelFilter(executor)
+        list(pf.filter([Product("warm", Color.RED, Size.SMALL)], cheap))  # start the workers
+
+        for label, spec in (("cheap spec", cheap), ("expensive spec", expensive)):
+            print(f"{label} ({pf.max_workers} workers):")
+            for n in sizes:
+                products = [Product(f"p{i}", colors[i % 3], sizes_[i // 3 % 3]) for i in range(n)]
+                start = perf_counter()
+                expected = list(BetterFilter().filter(products, spec))
+                single = perf_counter() - start
+                start = perf_counter()
+                got = list(pf.filter(products, spec))
+                parallel = perf_counter() - start
+                assert got == expected
+                winner = "parallel" if parallel < single else "single"
+                print(f" - {n:>9} products: single {single * 1000:8.1f} ms,"
+                      f" parallel {parallel * 1000:8.1f} ms --> {winner} wins")
+
+
+if __name__ == "__main__":
+    apple = Product("Apple", Color.GREEN, Size.SMALL)
+    tree = Product("Tree", Color.GREEN, Size.LARGE)
+    house = Product("House", Color.BLUE, Size.LARGE)
+    products = [apple, tree, house] * 5
+
+    pf = ParallelFilter(max_workers=2, chunk_size=4)
+    print("Large items (in order):")
+    for p in pf.filter(products, SizeSpecification(Size.LARGE)):
+        print(f" - {p.name} is large")
+
+    print("First green item (the rest of the work is cancelled):")
+    print(f" - {next(pf.filter(products, ColorSpecification(Color.GREEN))).name}")
+
+    # python OCPParallel.py bench
+    if sys.argv[1:2] == ["bench"]:
+        benchmark()
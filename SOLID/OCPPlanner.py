@@ -0,0 +1,301 @@
+# Open-Closed Principle, part 3: planning specification trees
+
+# With &, | and ~ users can write any boolean expression, e.g.
+#   (large & blue) & ~~(blue & cheap)
+# AndSpecification evaluates its children in the order they were written.
+# If the first one is expensive and almost always true, every item pays for it.
+
+# A SpecificationPlanner rewrites a tree before it is evaluated:
+#   1. pushes ~ down to the leaves (De Morgan) and removes double negations
+#   2. flattens nested And/And and Or/Or into a single level
+#   3. removes duplicated predicates (blue & blue --> blue)
+#   4. orders the children so the cheapest, most selective checks run first
+# Step 4 uses hit-rate counters that the planned tree updates while it runs,
+# so a PlannedFilter gets better the more items it sees.
+
+import sys
+from time import perf_counter
+from timeit import timeit
+
+from OCPrinciple import (
+    AndSpecification,
+    BetterFilter,
+    Color,
+    ColorSpecification,
+    Filter,
+    NotSpecification,
+    OrSpecification,
+    Product,
+    Size,
+    SizeSpecification,
+    Specification,
+)
+
+
+def normalize(spec, negate=False):
+    """Push every ~ down to the leaves and flatten And/Or chains"""
+    kind = type(spec)
+    if kind is NotSpecification:
+        return normalize(spec.spec, not negate)
+    if kind is AndSpecification or kind is OrSpecification:
+        # De Morgan: ~(a & b) == ~a | ~b and ~(a | b) == ~a & ~b
+        if negate:
+            kind = OrSpecification if kind is AndSpecification else AndSpecification
+        args = []
+        for arg in spec.args:
+            arg = normalize(arg, negate)
+            if type(arg) is kind:
+                args.extend(arg.args)
+            else:
+                args.append(arg)
+        return kind(*args)
+    return NotSpecification(spec) if negate else spec
+
+
+def canonical_key(spec):
+    """A string that is the same for equivalent trees (blue & large == large & blue),
+    or None when the tree contains a specification we cannot see inside of.
+    Custom specifications can take part by defining a key() method."""
+    return _key(normalize(spec))
+
+
+def _key(spec):
+    kind = type(spec)
+    if kind is ColorSpecification:
+        return f"color=={spec.color!r}"
+    if kind is SizeSpecification:
+        return f"size=={spec.size!r}"
+    if kind is AndSpecification or kind is OrSpecification:
+        keys = [_key(arg) for arg in spec.args]
+        if None in keys:
+            return None
+        name = "and" if kind is AndSpecification else "or"
+        return f"{name}({','.join(sorted(set(keys)))})"
+    if kind is NotSpecification:
+        key = _key(spec.spec)
+        return None if key is None else f"not({key})"
+    key = getattr(spec, "key", None)
+    if callable(key):
+        return f"{kind.__qualname__}:{key()}"
+    return None
+
+
+class SpecStats:
+    """What we have observed about one predicate, shared by every plan that uses it"""
+
+    __slots__ = ("calls", "hits", "samples", "seconds")
+
+    # Timing every call would cost more than most predicates, so only 1 in 32 is timed
+    sample_mask = 31
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.samples = 0
+        self.seconds = 0.0
+
+    @property
+    def pass_rate(self):
+        # Until we have seen anything, assume a coin flip
+        return (self.hits + 1) / (self.calls + 2)
+
+    @property
+    def cost(self):
+        return self.seconds / self.samples if self.samples else 1e-6
+
+    def __repr__(self):
+        return f"SpecStats(calls={self.calls}, pass_rate={self.pass_rate:.2f}, cost={self.cost * 1e9:.0f}ns)"
+
+
+class _PlannedNode(Specification):
+    def __init__(self, args, stats):
+        self.args = list(args)
+        self.stats = list(stats)
+
+    @staticmethod
+    def _timed(spec, stats, item):
+        start = perf_counter()
+        satisfied = spec.is_satisfied(item)
+        stats.seconds += perf_counter() - start
+        stats.samples += 1
+        return satisfied
+
+    def reorder(self):
+        for arg in self.args:
+            if isinstance(arg, _PlannedNode):
+                arg.reorder()
+        pairs = sorted(zip(self.args, self.stats), key=lambda pair: self.rank(pair[1]))
+        self.args = [arg for arg, _ in pairs]
+        self.stats = [stats for _, stats in pairs]
+
+
+class PlannedAnd(_PlannedNode):
+    """Stops at the first failing child, so the best first child is
+    the one that fails most often for the least money."""
+
+    @staticmethod
+    def rank(stats):
+        return stats.cost / (1.0 - stats.pass_rate)
+
+    def is_satisfied(self, item):
+        for spec, stats in zip(self.args, self.stats):
+            stats.calls += 1
+            if stats.calls & SpecStats.sample_mask:
+                satisfied = spec.is_satisfied(item)
+            else:
+                satisfied = self._timed(spec, stats, item)
+            if not satisfied:
+                return False
+            stats.hits += 1
+        return True
+
+
+class PlannedOr(_PlannedNode):
+    """Stops at the first passing child, so cheap and likely children go first."""
+
+    @staticmethod
+    def rank(stats):
+        return stats.cost / stats.pass_rate
+
+    def is_satisfied(self, item):
+        for spec, stats in zip(self.args, self.stats):
+            stats.calls += 1
+            if stats.calls & SpecStats.sample_mask:
+                satisfied = spec.is_satisfied(item)
+            else:
+                satisfied = self._timed(spec, stats, item)
+            if satisfied:
+                stats.hits += 1
+                return True
+        return False
+
+
+class SpecificationPlanner:
+    def __init__(self):
+        # canonical key (or identity) -> SpecStats
+        self.stats = {}
+        # id -> the opaque specifications used in identity keys, kept alive so their id is not reused
+        self._opaque = {}
+
+    def _identity(self, spec):
+        """Key of a tree we cannot see all the way inside of, from its leaves: normalize()
+        builds new Not/And/Or nodes on every plan(), but the leaves stay the same objects"""
+        kind = type(spec)
+        if kind is NotSpecification:
+            return ("not", self._identity(spec.spec))
+        if kind is AndSpecification or kind is OrSpecification:
+            name = "and" if kind is AndSpecification else "or"
+            return (name, frozenset(self._identity(arg) for arg in spec.args))
+        key = _key(spec)
+        if key is not None:
+            return key
+        self._opaque[id(spec)] = spec
+        return ("id", id(spec))
+
+    def _stats_for(self, spec):
+        key = canonical_key(spec)
+        if key is None:
+            key = self._identity(spec)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = SpecStats()
+        return key, stats
+
+    def plan(self, spec):
+        return self._build(normalize(spec))
+
+    def _build(self, spec):
+        kind = type(spec)
+        if kind is not AndSpecification and kind is not OrSpecification:
+            return spec
+        args, stats, seen = [], [], set()
+        for arg in spec.args:
+            key, arg_stats = self._stats_for(arg)
+            if key in seen:
+                continue
+            seen.add(key)
+            args.append(self._build(arg))
+            stats.append(arg_stats)
+        if len(args) == 1:
+            return args[0]
+        node = PlannedAnd(args, stats) if kind is AndSpecification else PlannedOr(args, stats)
+        node.reorder()
+        return node
+
+
+class PlannedFilter(Filter):
+    """Same generator API and results as BetterFilter. The tree is planned
+    once per call and re-ordered every `reorder_every` items from the counters."""
+
+    def __init__(self, planner=None, reorder_every=1024):
+        self.planner = planner or SpecificationPlanner()
+        self.reorder_every = reorder_every
+
+    def filter(self, items, spec):
+        plan = self.planner.plan(spec)
+        reorder = getattr(plan, "reorder", None)
+        countdown = self.reorder_every
+        for item in items:
+            if plan.is_satisfied(item):
+                yield item
+            if reorder is not None:
+                countdown -= 1
+                if not countdown:
+                    reorder()
+                    countdown = self.reorder_every
+
+
+class SlowSpecification(Specification):
+    """Stands in for an expensive check, e.g. one that looks something up"""
+
+    def __init__(self, spec, work=1000):
+        self.spec = spec
+        self.work = work
+
+    def key(self):
+        return f"{canonical_key(self.spec)}/{self.work}"
+
+    def is_satisfied(self, item):
+        sum(range(self.work))
+        return self.spec.is_satisfied(item)
+
+
+def benchmark(n=200_000):
+    colors, sizes = list(Color), list(Size)
+    products = [Product(f"p{i}", colors[i % 3], sizes[i % 7 % 3]) for i in range(n)]
+    # written in the worst possible order: slow and rarely false first
+    spec = SlowSpecification(~ColorSpecification(Color.RED)) & SizeSpecification(Size.SMALL)
+
+    assert list(BetterFilter().filter(products, spec)) == list(PlannedFilter().filter(products, spec))
+
+    naive = timeit(lambda: list(BetterFilter().filter(products, spec)), number=1)
+    planned = timeit(lambda: list(PlannedFilter().filter(products, spec)), number=1)
+    print(f"{n} products, slow(not red) & small:")
+    print(f" - BetterFilter:  {naive * 1000:.1f} ms")
+    print(f" - PlannedFilter: {planned * 1000:.1f} ms ({naive / planned:.1f}x)")
+
+
+if __name__ == "__main__":
+    apple = Product("Apple", Color.GREEN, Size.SMALL)
+    tree = Product("Tree", Color.GREEN, Size.LARGE)
+    house = Product("House", Color.BLUE, Size.LARGE)
+    products = [apple, tree, house]
+
+    green = ColorSpecification(Color.GREEN)
+    large = SizeSpecification(Size.LARGE)
+    blue = ColorSpecification(Color.BLUE)
+
+    planner = SpecificationPlanner()
+    messy = (large & blue) & ~~(blue & large) & ~(green | SizeSpecification(Size.SMALL))
+    plan = planner.plan(messy)
+    print(f"{canonical_key(messy)}\n --> planned as {type(plan).__name__} of {len(plan.args)} checks")
+
+    print("Large blue items (planned):")
+    for p in PlannedFilter(planner).filter(products, messy):
+        print(f" - {p.name} is large and blue")
+    for key, stats in planner.stats.items():
+        print(f"   {key}: {stats}")
+
+    # python OCPPlanner.py bench [number of products]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,173 @@
+# Open-Closed Principle, part 6: a compact product table
+
+# Even with __slots__, every Product is a Python object with three references,
+# plus a separate str object for its name. With 10 million products that adds up.
+
+# ProductTable stores the same data as a "struct of arrays":
+#   - all names are encoded into one bytearray, with an array of offsets into it
+#   - color and size are one byte each: the position of the value in its Enum
+# table[i] hands out a ProductRow, a tiny view with name/color/size properties,
+# so BetterFilter, ProductFilter and every Specification work on it unchanged.
+
+import csv
+import sys
+import tracemalloc
+from array import array
+
+from OCPrinciple import (
+    BetterFilter,
+    Color,
+    ColorSpecification,
+    Product,
+    ProductFilter,
+    Size,
+    SizeSpecification,
+)
+
+
+class ProductRow:
+    """A view of one row of a ProductTable, looks like a Product to everyone else"""
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def name(self):
+        return self.table.name_at(self.row)
+
+    @property
+    def color(self):
+        return self.table.color_values[self.table.colors[self.row]]
+
+    @property
+    def size(self):
+        return self.table.size_values[self.table.sizes[self.row]]
+
+    def __eq__(self, other):
+        return isinstance(other, ProductRow) and other.table is self.table and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    def __reduce__(self):
+        # Sent to another process (e.g. by ParallelFilter) as a plain Product
+        return Product, (self.name, self.color, self.size)
+
+    def __repr__(self):
+        return f"ProductRow({self.name!r}, {self.color}, {self.size})"
+
+
+class ProductTable:
+    def __init__(self, color_type=Color, size_type=Size):
+        self.color_values = list(color_type)
+        self.size_values = list(size_type)
+        self._color_codes = {value: code for code, value in enumerate(self.color_values)}
+        self._size_codes = {value: code for code, value in enumerate(self.size_values)}
+        self._color_type = color_type
+        self._size_type = size_type
+
+        self.names = bytearray()
+        self.name_offsets = array("Q", [0])
+        self.colors = array("B")
+        self.sizes = array("B")
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("ProductTable index out of range")
+        return ProductRow(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield ProductRow(self, row)
+
+    def name_at(self, row):
+        offsets = self.name_offsets
+        return self.names[offsets[row]:offsets[row + 1]].decode()
+
+    def append(self, name, color, size):
+        self.names += name.encode()
+        self.name_offsets.append(len(self.names))
+        self.colors.append(self._color_codes[color])
+        self.sizes.append(self._size_codes[size])
+
+    def extend(self, rows):
+        """Bulk load (name, color, size) tuples; nothing is kept per row
+        except the bytes that end up in the arrays."""
+        names, offsets = self.names, self.name_offsets
+        colors, sizes = self.colors, self.sizes
+        color_codes, size_codes = self._color_codes, self._size_codes
+        for name, color, size in rows:
+            names += name.encode()
+            offsets.append(len(names))
+            colors.append(color_codes[color])
+            sizes.append(size_codes[size])
+
+    @classmethod
+    def from_rows(cls, rows, color_type=Color, size_type=Size):
+        table = cls(color_type, size_type)
+        table.extend(rows)
+        return table
+
+    @classmethod
+    def from_csv(cls, path, color_type=Color, size_type=Size):
+        """Read a name,color,size CSV file, where colors and sizes are
+        written by their Enum names (e.g. Apple,GREEN,SMALL)"""
+        table = cls(color_type, size_type)
+        with open(path, newline="") as fh:
+            rows = csv.reader(fh)
+            header = next(rows, None)
+            if header is not None and header != ["name", "color", "size"]:
+                raise ValueError(f"Expected a name,color,size header, got {header}")
+            table.extend((name, color_type[color], size_type[size]) for name, color, size in rows)
+        return table
+
+
+def benchmark(n=1_000_000):
+    colors, sizes = list(Color), list(Size)
+    rows = ((f"product{i}", colors[i % 3], sizes[i // 3 % 3]) for i in range(n))
+
+    tracemalloc.start()
+    products = [Product(*row) for row in rows]
+    objects, _ = tracemalloc.get_traced_memory()
+    del products
+    tracemalloc.stop()
+
+    rows = ((f"product{i}", colors[i % 3], sizes[i // 3 % 3]) for i in range(n))
+    tracemalloc.start()
+    table = ProductTable.from_rows(rows)
+    packed, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{n} products:")
+    print(f" - list of Product: {objects / 2 ** 20:7.1f} MiB")
+    print(f" - ProductTable:    {packed / 2 ** 20:7.1f} MiB ({objects / packed:.1f}x smaller)")
+    print(f" - {len(list(BetterFilter().filter(table, ColorSpecification(Color.BLUE))))} of them are blue")
+
+
+if __name__ == "__main__":
+    table = ProductTable.from_rows([
+        ("Apple", Color.GREEN, Size.SMALL),
+        ("Tree", Color.GREEN, Size.LARGE),
+        ("House", Color.BLUE, Size.LARGE),
+    ])
+
+    print("Green products (old filter, table):")
+    for p in ProductFilter().filter_by_color(table, Color.GREEN):
+        print(f" - {p.name} is green")
+
+    print("Large blue items (new filter, table):")
+    large_blue = SizeSpecification(Size.LARGE) & ColorSpecification(Color.BLUE)
+    for p in BetterFilter().filter(table, large_blue):
+        print(f" - {p.name} is large and blue")
+
+    # python OCPTable.py bench [number of products]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -17,10 +17,24 @@ class Size(Enum):
 
 
 class Product:
+    # No per-instance __dict__, just three fixed fields: much smaller when there are millions.
+    # For even less memory see ProductTable in OCPTable.py
+    __slots__ = ("name", "color", "size")
+
+    # Bumped every time an existing product is changed, so anything that
+    # remembers filter results (e.g. CachedFilter in OCPCache.py) knows they are stale.
+    version = 0
+
     def __init__(self, name, color, size):
-        self.name = name
-        self.color = color
-        self.size = size
+        # Straight into the slots: a new product is not a change, and creating millions
+        # of them should not pay for the check in __setattr__
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "color", color)
+        object.__setattr__(self, "size", size)
+
+    def __setattr__(self, name, value):
+        Product.version += 1
+        object.__setattr__(self, name, value)
 
 
 # one of the requirements of this application
@@ -69,6 +83,13 @@ class Specification:
     def __and__(self, other):
         return AndSpecification(self, other)
 
+    # Same idea for "or" (spec1 | spec2) and "not" (~spec)
+    def __or__(self, other):
+        return OrSpecification(self, other)
+
+    def __invert__(self):
+        return NotSpecification(self)
+
 
 """Base class 2"""
 
@@ -130,6 +151,26 @@ class AndSpecification(Specification):
         return all(map(lambda spec: spec.is_satisfied(item), self.args))
 
 
+class OrSpecification(Specification):
+    """Satisfied when at least one of the specifications is satisfied"""
+
+    def __init__(self, *args):
+        self.args = args
+
+    def is_satisfied(self, item):
+        return any(map(lambda spec: spec.is_satisfied(item), self.args))
+
+
+class NotSpecification(Specification):
+    """Satisfied when the wrapped specification is not"""
+
+    def __init__(self, spec):
+        self.spec = spec
+
+    def is_satisfied(self, item):
+        return not self.spec.is_satisfied(item)
+
+
 if __name__ == "__main__":
     apple = Product("Apple", Color.GREEN, Size.SMALL)
     tree = Product("Tree", Color.GREEN, Size.LARGE)
@@ -164,3 +205,12 @@ if __name__ == "__main__":
     large_blue = large & ColorSpecification(Color.BLUE)  # Works thanks to __and__ method
     for p in bf.filter(products, large_blue):
         print(f" - {p.name} is large and blue")
+
+    print("Small or blue items:")
+    small_or_blue = SizeSpecification(Size.SMALL) | ColorSpecification(Color.BLUE)
+    for p in bf.filter(products, small_or_blue):
+        print(f" - {p.name} is small or blue")
+
+    print("Items that are not green:")
+    for p in bf.filter(products, ~green):
+        print(f" - {p.name} is not green")
@@ -0,0 +1,307 @@
+# Single Responsibility Principle, part 4: persistence for asyncio services
+
+# PersistenceManager.save_to_file() blocks on open/write/close. Inside an asyncio
+# service that freezes the event loop: nothing else runs until the file is written.
+
+# AsyncPersistenceManager is the same responsibility behind an async interface,
+# with interchangeable backends (the Journal does not know or care which one):
+#   - FileBackend      one file per journal, written by a bounded thread pool
+#   - SQLiteBackend    one row per journal, through a pool of sqlite3 connections
+#   - KeyValueBackend  a local dbm database, standing in for a key-value server
+# Every backend limits how many saves run at once (max_concurrency), reuses a
+# bounded number of handles, and can save many journals in one batch (save_many).
+
+import asyncio
+import dbm
+import os
+import sqlite3
+import sys
+import tempfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from SingleResp import Journal, PersistenceManager
+
+
+def text_of(items):
+    """(key, journal) pairs -> (key, text) pairs"""
+    return [(key, str(journal)) for key, journal in items]
+
+
+def journal_from_text(text):
+    journal = Journal()
+    if text:
+        journal.entries = text.split("\n")
+        journal.count = int(journal.entries[-1].split(":", 1)[0])
+    return journal
+
+
+class HandlePool:
+    """At most `size` handles (connections, open databases...), created on first use
+    and handed out to one user at a time"""
+
+    def __init__(self, create, size, close=None):
+        self._create = create
+        self._close = close
+        self.size = size
+        self.created = 0
+        self._idle = None
+
+    async def acquire(self, loop, executor):
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        while True:
+            if self._idle.empty() and self.created < self.size:
+                self.created += 1
+                try:
+                    return await loop.run_in_executor(executor, self._create)
+                except BaseException:
+                    # Room for another try, and whoever waits for an idle handle is woken up to make it
+                    self.created -= 1
+                    self._idle.put_nowait(None)
+                    raise
+            handle = await self._idle.get()
+            if handle is not None:
+                return handle
+
+    def release(self, handle):
+        self._idle.put_nowait(handle)
+
+    def close_all(self):
+        while self._idle is not None and not self._idle.empty():
+            handle = self._idle.get_nowait()
+            if handle is not None and self._close is not None:
+                self._close(handle)
+
+
+class AsyncPersistenceManager(ABC):
+    def __init__(self, max_concurrency=64, workers=4):
+        self.max_concurrency = max_concurrency
+        self._limit = None
+        self._executor = ThreadPoolExecutor(workers)
+
+    def _semaphore(self):
+        # Created inside the running loop (asyncio primitives must not outlive their loop)
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrency)
+        return self._limit
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def save(self, journal, key):
+        await self.save_many({key: journal})
+
+    async def save_many(self, journals, batch_size=100):
+        """Save a {key: journal} dict, `batch_size` journals per backend call.
+        The journals are turned into text by the worker threads, not on the event
+        loop: do not change them before the save is done."""
+        items = list(journals.items())
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+        async def one(batch):
+            async with self._semaphore():
+                await self._write_batch(batch)
+
+        await asyncio.gather(*map(one, batches))
+
+    async def load(self, key):
+        async with self._semaphore():
+            return journal_from_text(await self._read(key))
+
+    @abstractmethod
+    async def _write_batch(self, items):
+        """Store a list of (key, journal) pairs, calling text_of() in the worker thread"""
+
+    @abstractmethod
+    async def _read(self, key):
+        """The text stored under key"""
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class FileBackend(AsyncPersistenceManager):
+    def __init__(self, folder, max_concurrency=64, workers=8):
+        super().__init__(max_concurrency, workers)
+        self.folder = folder
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.txt")
+
+    def _write_files(self, items):
+        for key, text in text_of(items):
+            # A temporary file of its own: two saves of the same key may run at the same time
+            fd, tmp = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=self.folder)
+            try:
+                with open(fd, "w") as fh:
+                    fh.write(text)
+                os.replace(tmp, self._path(key))  # readers never see half a journal
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    def _read_file(self, key):
+        with open(self._path(key)) as fh:
+            return fh.read()
+
+    async def _write_batch(self, items):
+        await self._run(self._write_files, items)
+
+    async def _read(self, key):
+        return await self._run(self._read_file, key)
+
+
+class SQLiteBackend(AsyncPersistenceManager):
+    def __init__(self, path, max_concurrency=64, pool_size=4):
+        super().__init__(max_concurrency, pool_size)
+        self.path = path
+        self.pool = HandlePool(self._connect, pool_size, close=lambda connection: connection.close())
+
+    def _connect(self):
+        # Each connection is only used by one thread at a time, thanks to the pool
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS journals (key TEXT PRIMARY KEY, text TEXT)")
+        return connection
+
+    @staticmethod
+    def _write_rows(connection, items):
+        with connection:  # one transaction per batch
+            connection.executemany("INSERT OR REPLACE INTO journals (key, text) VALUES (?, ?)", text_of(items))
+
+    @staticmethod
+    def _read_row(connection, key):
+        row = connection.execute("SELECT text FROM journals WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    async def _with_connection(self, function, *args):
+        connection = await self.pool.acquire(asyncio.get_running_loop(), self._executor)
+        try:
+            return await self._run(function, connection, *args)
+        finally:
+            self.pool.release(connection)
+
+    async def _write_batch(self, items):
+        await self._with_connection(self._write_rows, items)
+
+    async def _read(self, key):
+        return await self._with_connection(self._read_row, key)
+
+    async def close(self):
+        self.pool.close_all()
+        await super().close()
+
+
+class KeyValueBackend(AsyncPersistenceManager):
+    """dbm files are not safe to share between handles, so the pool holds a single one"""
+
+    def __init__(self, path, max_concurrency=64):
+        super().__init__(max_concurrency, workers=1)
+        self.path = path
+        self.pool = HandlePool(lambda: dbm.open(path, "c"), 1, close=lambda db: db.close())
+
+    @staticmethod
+    def _put(db, items):
+        for key, text in text_of(items):
+            db[key] = text
+        sync = getattr(db, "sync", None)
+        if sync is not None:
+            sync()
+
+    @staticmethod
+    def _get(db, key):
+        return db[key].decode()
+
+    async def _with_db(self, function, *args):
+        db = await self.pool.acquire(asyncio.get_running_loop(), self._executor)
+        try:
+            return await self._run(function, db, *args)
+        finally:
+            self.pool.release(db)
+
+    async def _write_batch(self, items):
+        await self._with_db(self._put, items)
+
+    async def _read(self, key):
+        return await self._with_db(self._get, key)
+
+    async def close(self):
+        self.pool.close_all()
+        await super().close()
+
+
+async def _heartbeat(stalls, stop):
+    """Measures how long the event loop was unable to run us"""
+    while not stop.is_set():
+        start = perf_counter()
+        await asyncio.sleep(0.001)
+        stalls.append(perf_counter() - start - 0.001)
+
+
+async def _measure(label, save_all, saves):
+    stalls, stop = [], asyncio.Event()
+    heartbeat = asyncio.ensure_future(_heartbeat(stalls, stop))
+    await asyncio.sleep(0)
+    start = perf_counter()
+    await save_all()
+    elapsed = perf_counter() - start
+    stop.set()
+    await heartbeat
+    print(f" - {label:<26} {saves / elapsed:8.0f} saves/s, longest event loop stall {max(stalls) * 1000:7.1f} ms")
+
+
+async def benchmark(saves=1000, entries=100):
+    folder = tempfile.mkdtemp()
+    journals = {}
+    for i in range(saves):
+        journals[f"journal{i}"] = j = Journal()
+        for e in range(entries):
+            j.add_entry(f"Entry {e} of journal {i}")
+
+    async def sync_path():
+        for key, journal in journals.items():
+            PersistenceManager.save_to_file(journal, os.path.join(folder, f"sync-{key}.txt"))
+
+    backends = {
+        "FileBackend": FileBackend(folder),
+        "SQLiteBackend": SQLiteBackend(os.path.join(folder, "journals.db")),
+        "KeyValueBackend": KeyValueBackend(os.path.join(folder, "journals.kv")),
+    }
+
+    print(f"{saves} concurrent journal saves ({entries} entries each):")
+    await _measure("sync save_to_file", sync_path, saves)
+    for label, backend in backends.items():
+        async def one_by_one(backend=backend):
+            await asyncio.gather(*(backend.save(journal, key) for key, journal in journals.items()))
+
+        await _measure(label, one_by_one, saves)
+        await _measure(label + " (batched)", lambda backend=backend: backend.save_many(journals), saves)
+        await backend.close()
+
+
+async def main():
+    folder = tempfile.mkdtemp()
+    j = Journal()
+    j.add_entry("I cried today.")
+    j.add_entry("I ate a bug.")
+
+    for backend in (
+        FileBackend(folder),
+        SQLiteBackend(os.path.join(folder, "journals.db")),
+        KeyValueBackend(os.path.join(folder, "journals.kv")),
+    ):
+        await backend.save(j, "diary")
+        print(f"{type(backend).__name__} loaded back:\n{await backend.load('diary')}")
+        await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+    # python SRPAsyncPersistence.py bench [number of saves]
+    if sys.argv[1:2] == ["bench"]:
+        asyncio.run(benchmark(*map(int, sys.argv[2:3])))
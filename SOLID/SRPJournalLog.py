@@ -0,0 +1,355 @@
+# Single Responsibility Principle, part 2: a persistence manager that scales
+
+# PersistenceManager.save_to_file() turns the whole Journal into one string
+# and rewrites the whole file on every save. With millions of entries, saving
+# one new entry costs as much as saving all of them.
+
+# Because persistence is its own responsibility, we can swap in a better
+# persistence manager without touching Journal at all:
+#   - the file is an append-only log: only entries added since the last save are written
+#   - remove_entry() is written as a small "tombstone" record, not a rewrite
+#   - fsync is expensive, so saves made within `commit_window` seconds share one
+#     (a "group commit") done by a background thread
+#   - when tombstoned entries take up too much of the file, it is compacted in the background
+#   - load() streams entries back instead of reading one huge string
+#   - saving a different Journal to the file rewrites it, as PersistenceManager would
+
+# Every record is: op (1 byte), entry number (8 bytes), text length (4 bytes), text (utf-8)
+
+import os
+import struct
+import sys
+import tempfile
+import threading
+import weakref
+from time import perf_counter
+
+from SingleResp import Journal, PersistenceManager
+
+HEADER = struct.Struct("<BQI")
+ADD = 1
+REMOVE = 2
+
+
+def _number_of(entry):
+    """Journal entries look like '12: text'"""
+    return int(entry.split(":", 1)[0])
+
+
+def _read_records(fh):
+    read = fh.read
+    while True:
+        header = read(HEADER.size)
+        if len(header) < HEADER.size:
+            return  # end of file, or a record that was only half written before a crash
+        op, number, length = HEADER.unpack(header)
+        text = read(length)
+        if len(text) < length:
+            return
+        yield op, number, text
+
+
+def iter_entries(filename):
+    """Stream the live entries of a log, oldest first. The first pass only
+    collects tombstones, so memory use does not depend on the journal size."""
+    with open(filename, "rb", buffering=1 << 16) as fh:
+        removed = {number for op, number, _ in _read_records(fh) if op == REMOVE}
+    with open(filename, "rb", buffering=1 << 16) as fh:
+        for op, number, text in _read_records(fh):
+            if op == ADD and number not in removed:
+                yield f"{number}: {text.decode()}"
+
+
+class JournalLog:
+    """An append-only log file that one or more saves of a Journal go into"""
+
+    def __init__(self, filename, commit_window=0.005, compact_ratio=0.5, compact_min_records=10_000):
+        self.filename = filename
+        self.commit_window = commit_window
+        self.compact_ratio = compact_ratio
+        self.compact_min_records = compact_min_records
+
+        self.saved_count = 0  # journal.count when we last saved it
+        self.live = bytearray()  # one bit per entry number that is in the file and not removed
+        self.live_count = 0
+        self.records = 0
+        self._journal = None  # weak reference to the journal the file holds, once we know which one
+        if os.path.exists(filename):
+            complete = 0
+            with open(filename, "rb", buffering=1 << 16) as fh:
+                for op, number, text in _read_records(fh):
+                    self._replay(op, number)
+                    complete += HEADER.size + len(text)
+            # Cut off a record only half written before a crash, or new records would be appended after it
+            if os.path.getsize(filename) != complete:
+                with open(filename, "r+b") as fh:
+                    fh.truncate(complete)
+
+        self._file = open(filename, "ab")
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._compacting = None
+        self._closed = False
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self._syncer.start()
+
+    # -- bookkeeping of which entry numbers are live --
+
+    def _is_live(self, number):
+        byte = number >> 3
+        return byte < len(self.live) and self.live[byte] >> (number & 7) & 1
+
+    def _replay(self, op, number):
+        self.records += 1
+        if op == ADD:
+            byte = number >> 3
+            if byte >= len(self.live):
+                self.live.extend(bytes(byte + 1 - len(self.live)))
+            self.live[byte] |= 1 << (number & 7)
+            self.live_count += 1
+            self.saved_count = max(self.saved_count, number)
+        elif self._is_live(number):
+            self.live[number >> 3] &= ~(1 << (number & 7))
+            self.live_count -= 1
+
+    # -- saving --
+
+    def _holds(self, journal):
+        """Is the file a save of this journal? Its saved entries must all be live in the file, in order."""
+        if journal.count < self.saved_count:
+            return False
+        with self._lock:
+            self._file.flush()
+        saved = (entry for entry in journal.entries if _number_of(entry) <= self.saved_count)
+        expected = next(saved, None)
+        for entry in iter_entries(self.filename):
+            if expected is None:
+                break
+            if entry == expected:
+                expected = next(saved, None)
+        return expected is None
+
+    def save(self, journal, durable=False):
+        """Write what changed since the last save. With durable=True, wait until it is on disk.
+        Saving a journal the file does not hold replaces the file's content with it."""
+        if self._journal is None or self._journal() is not journal:
+            if self.records and not self._holds(journal):
+                self.rewrite(journal)
+                return
+            self._journal = weakref.ref(journal)
+
+        new = []
+        for entry in reversed(journal.entries):
+            number = _number_of(entry)
+            if number <= self.saved_count:
+                break
+            new.append((number, entry[len(str(number)) + 2:]))
+        new.reverse()
+
+        removed = []
+        # Entries are only ever appended after the last save, so if the sizes add up nothing was removed
+        if len(journal.entries) != self.live_count + len(new):
+            present = {_number_of(entry) for entry in journal.entries}
+            removed = [n for n in range(1, self.saved_count + 1) if self._is_live(n) and n not in present]
+
+        chunks = []
+        for number in removed:
+            chunks.append(HEADER.pack(REMOVE, number, 0))
+        for number, text in new:
+            data = text.encode()
+            chunks.append(HEADER.pack(ADD, number, len(data)))
+            chunks.append(data)
+
+        with self._lock:
+            if chunks:
+                self._file.write(b"".join(chunks))
+                for number in removed:
+                    self._replay(REMOVE, number)
+                for number, _ in new:
+                    self._replay(ADD, number)
+                self._written_seq += 1
+                self._synced.notify_all()
+            if durable:
+                seq = self._written_seq
+                while self._synced_seq < seq:
+                    self._synced.wait()
+        self._maybe_compact()
+
+    def _sync_loop(self):
+        with self._lock:
+            while not self._closed:
+                if self._synced_seq == self._written_seq:
+                    self._synced.wait()
+                    continue
+                # Give other saves a moment to join this commit
+                self._synced.wait(self.commit_window)
+                seq = self._written_seq
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._synced_seq = seq
+                self._synced.notify_all()
+
+    # -- compaction --
+
+    def _maybe_compact(self):
+        dead = self.records - self.live_count
+        if (
+            self._compacting is None
+            and self.records >= self.compact_min_records
+            and dead > self.compact_ratio * self.records
+        ):
+            self._compacting = threading.Thread(target=self.compact, daemon=True)
+            self._compacting.start()
+
+    def compact(self):
+        """Rewrite the file with only the live entries, then swap it in"""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            tmp = self.filename + ".compact"
+            records = 0
+            with open(self.filename, "rb", buffering=1 << 16) as src, open(tmp, "wb", buffering=1 << 16) as dst:
+                for op, number, text in _read_records(src):
+                    if op == ADD and self._is_live(number):
+                        dst.write(HEADER.pack(ADD, number, len(text)))
+                        dst.write(text)
+                        records += 1
+                dst.flush()
+                os.fsync(dst.fileno())
+            self._file.close()
+            os.replace(tmp, self.filename)
+            self._file = open(self.filename, "ab")
+            self.records = records
+            self._synced_seq = self._written_seq
+            self._compacting = None
+
+    def rewrite(self, journal):
+        """Replace the content of the file with the entries of this journal"""
+        compacting = self._compacting
+        if compacting is not None:
+            compacting.join()
+        with self._lock:
+            tmp = self.filename + ".rewrite"
+            with open(tmp, "wb", buffering=1 << 16) as dst:
+                for entry in journal.entries:
+                    number = _number_of(entry)
+                    data = entry[len(str(number)) + 2:].encode()
+                    dst.write(HEADER.pack(ADD, number, len(data)))
+                    dst.write(data)
+                dst.flush()
+                os.fsync(dst.fileno())
+            self._file.close()
+            os.replace(tmp, self.filename)
+            self._file = open(self.filename, "ab")
+            self.saved_count = 0
+            self.live = bytearray()
+            self.live_count = 0
+            self.records = 0
+            for entry in journal.entries:
+                self._replay(ADD, _number_of(entry))
+            # The journal may have removed its newest entries: those numbers are used up all the same
+            self.saved_count = journal.count
+            self._synced_seq = self._written_seq
+            self._journal = weakref.ref(journal)
+
+    def close(self):
+        compacting = self._compacting
+        if compacting is not None:
+            compacting.join()
+        with self._lock:
+            self._closed = True
+            self._synced.notify_all()
+        self._syncer.join()
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            # The sync thread is gone: durable saves still waiting are on disk now
+            self._synced_seq = self._written_seq
+            self._synced.notify_all()
+            self._file.close()
+
+    def flush(self):
+        """Hand what was written so far to the OS, so that reading the file sees it"""
+        with self._lock:
+            self._file.flush()
+
+
+class LogPersistenceManager:
+    """Same idea as PersistenceManager, but backed by one JournalLog per file"""
+
+    logs = {}
+
+    @staticmethod
+    def save_to_file(journal, filename, durable=False):
+        log = LogPersistenceManager.logs.get(filename)
+        if log is None:
+            log = LogPersistenceManager.logs[filename] = JournalLog(filename)
+        log.save(journal, durable)
+
+    @staticmethod
+    def load(filename):
+        log = LogPersistenceManager.logs.get(filename)
+        if log is not None:
+            log.flush()
+        journal = Journal()
+        for entry in iter_entries(filename):
+            journal.entries.append(entry)
+            journal.count = _number_of(entry)
+        return journal
+
+    @staticmethod
+    def close_all():
+        for log in LogPersistenceManager.logs.values():
+            log.close()
+        LogPersistenceManager.logs.clear()
+
+
+def benchmark(entries=100_000, saves=200):
+    folder = tempfile.mkdtemp()
+    journal = Journal()
+    for i in range(entries):
+        journal.add_entry(f"Entry number {i}")
+
+    text_file = os.path.join(folder, "journal.txt")
+    start = perf_counter()
+    for i in range(saves):
+        journal.add_entry(f"One more thing {i}")
+        PersistenceManager.save_to_file(journal, text_file)
+    rewrite = perf_counter() - start
+
+    log_file = os.path.join(folder, "journal.log")
+    LogPersistenceManager.save_to_file(journal, log_file, durable=True)
+    start = perf_counter()
+    for i in range(saves):
+        journal.add_entry(f"One more thing {i}")
+        LogPersistenceManager.save_to_file(journal, log_file)
+    LogPersistenceManager.save_to_file(journal, log_file, durable=True)
+    append = perf_counter() - start
+    LogPersistenceManager.close_all()
+
+    print(f"{saves} saves of a journal with {entries} entries, one new entry each:")
+    print(f" - PersistenceManager:    {rewrite * 1000:8.1f} ms")
+    print(f" - LogPersistenceManager: {append * 1000:8.1f} ms ({rewrite / append:.0f}x)")
+
+
+if __name__ == "__main__":
+    filename = os.path.join(tempfile.mkdtemp(), "journal.log")
+
+    j = Journal()
+    j.add_entry("I cried today.")
+    j.add_entry("I ate a bug.")
+    LogPersistenceManager.save_to_file(j, filename)
+
+    j.add_entry("I found a coin.")
+    j.remove_entry(0)
+    LogPersistenceManager.save_to_file(j, filename, durable=True)
+    LogPersistenceManager.close_all()
+
+    print(f"Journal entries:\n{j}")
+    print(f"Loaded back from {filename}:\n{LogPersistenceManager.load(filename)}")
+
+    # python SRPJournalLog.py bench [number of entries]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
@@ -0,0 +1,202 @@
+# Single Responsibility Principle, part 3: a journal that lives on disk
+
+# Journal keeps every entry in a Python list, so a big journal has to be read
+# completely before it can be used, and remove_entry() shifts the whole list.
+
+# MappedJournal has the same API (add_entry, remove_entry, entries, count, str())
+# but keeps its entries in files, accessed through mmap:
+#   <name>.dat  the text of every entry, one after the other
+#   <name>.idx  12 bytes per entry number: offset and length of its text in .dat
+#   <name>.del  the entry numbers that were removed
+# Entry n is at position (n - 1) * 12 of the index, so finding it is O(1), and
+# entry_text() returns a memoryview straight into the mapped file (no copy).
+# Opening only reads the (small) list of removed entries, not the journal itself.
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from time import perf_counter
+
+from SingleResp import Journal
+
+INDEX = struct.Struct("<QI")
+
+
+class _Entries:
+    """Read-only, list-like view of the formatted entries ('12: text')"""
+
+    def __init__(self, journal):
+        self.journal = journal
+
+    def __len__(self):
+        return len(self.journal)
+
+    def __getitem__(self, pos):
+        number = self.journal.number_at(pos)
+        return f"{number}: {self.journal.entry_text(number).tobytes().decode()}"
+
+    def __iter__(self):
+        journal = self.journal
+        removed = set(journal.removed)
+        for number in range(1, journal.count + 1):
+            if number not in removed:
+                yield f"{number}: {journal.entry_text(number).tobytes().decode()}"
+
+
+class MappedJournal:
+    def __init__(self, name):
+        self.name = name
+        self._data = open(name + ".dat", "a+b")
+        self._index = open(name + ".idx", "a+b")
+        self._deleted = open(name + ".del", "a+b")
+
+        # A crash can leave the last slot of the index (or of .del) half written:
+        # cut it off, or the next entry would be appended after it and read back wrong
+        self.count = os.fstat(self._index.fileno()).st_size // INDEX.size
+        self._index.truncate(self.count * INDEX.size)
+        self._data_size = os.fstat(self._data.fileno()).st_size
+        self._deleted.seek(0)
+        deleted = self._deleted.read()
+        self._deleted.truncate(len(deleted) - len(deleted) % 8)
+        self.removed = sorted(array("Q", deleted[: len(deleted) - len(deleted) % 8]))
+        self._data_map = None
+        self._index_map = None
+        self._dirty = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count - len(self.removed)
+
+    @property
+    def entries(self):
+        return _Entries(self)
+
+    def add_entry(self, text):
+        data = text.encode()
+        self._data.write(data)
+        self._index.write(INDEX.pack(self._data_size, len(data)))
+        self._data_size += len(data)
+        self.count += 1
+        self._dirty = True
+
+    def remove_entry(self, pos):
+        number = self.number_at(pos)
+        self._deleted.write(struct.pack("<Q", number))
+        self._deleted.flush()
+        bisect.insort(self.removed, number)
+
+    def number_at(self, pos):
+        """The entry number at list position pos (negative counts from the end).
+        Without removals that is simply pos + 1, otherwise a binary search over
+        'numbers up to n that are still live' finds it in O(log n * log removed)."""
+        size = len(self)
+        if pos < 0:
+            pos += size
+        if not 0 <= pos < size:
+            raise IndexError("journal index out of range")
+        if not self.removed:
+            return pos + 1
+        removed = self.removed
+        low, high = pos + 1, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if middle - bisect.bisect_right(removed, middle) >= pos + 1:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _maps(self):
+        if self._dirty:
+            self._data.flush()
+            self._index.flush()
+            self._dirty = False
+        # Files only ever grow, so a map is only replaced when it became too small.
+        # Old maps are not closed: memoryviews handed out earlier may still point into them.
+        if self._index_map is None or len(self._index_map) < self.count * INDEX.size:
+            self._index_map = mmap.mmap(self._index.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data_size and (self._data_map is None or len(self._data_map) < self._data_size):
+            self._data_map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._index_map, self._data_map
+
+    def entry_text(self, number):
+        """The text of entry `number`, as a memoryview into the mapped data file"""
+        if not 1 <= number <= self.count:
+            raise IndexError(f"there is no entry {number}")
+        i = bisect.bisect_left(self.removed, number)
+        if i < len(self.removed) and self.removed[i] == number:
+            raise IndexError(f"entry {number} was removed")
+        index_map, data_map = self._maps()
+        offset, length = INDEX.unpack_from(index_map, (number - 1) * INDEX.size)
+        if not length:
+            return memoryview(b"")
+        return memoryview(data_map)[offset:offset + length]
+
+    def __str__(self):
+        return "\n".join(self.entries)
+
+    def flush(self):
+        for fh in (self._data, self._index, self._deleted):
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._dirty = False
+
+    def close(self):
+        self.flush()
+        self._index_map = self._data_map = None
+        for fh in (self._data, self._index, self._deleted):
+            fh.close()
+
+
+def benchmark(entries=1_000_000):
+    name = os.path.join(tempfile.mkdtemp(), "journal")
+    with MappedJournal(name) as mj:
+        for i in range(entries):
+            mj.add_entry(f"Entry number {i}")
+
+    start = perf_counter()
+    mj = MappedJournal(name)
+    opened = perf_counter() - start
+    start = perf_counter()
+    text = mj.entries[entries // 2]
+    lookup = perf_counter() - start
+    mj.close()
+
+    j = Journal()
+    start = perf_counter()
+    for i in range(entries):
+        j.add_entry(f"Entry number {i}")
+    built = perf_counter() - start
+
+    print(f"Journal with {entries} entries:")
+    print(f" - Journal, building the list:    {built * 1000:8.1f} ms")
+    print(f" - MappedJournal, opening:        {opened * 1000:8.3f} ms")
+    print(f" - MappedJournal, middle entry:   {lookup * 1000:8.3f} ms ({text})")
+
+
+if __name__ == "__main__":
+    name = os.path.join(tempfile.mkdtemp(), "journal")
+
+    with MappedJournal(name) as mj:
+        mj.add_entry("I cried today.")
+        mj.add_entry("I ate a bug.")
+        mj.add_entry("I found a coin.")
+        mj.remove_entry(0)
+        print(f"Journal entries:\n{mj}")
+
+    with MappedJournal(name) as mj:
+        print(f"Opened again, entry 3 is {bytes(mj.entry_text(3))!r}")
+        print(f"First entry: {mj.entries[0]}")
+
+    # python SRPMappedJournal.py bench [number of entries]
+    if sys.argv[1:2] == ["bench"]:
+        benchmark(*map(int, sys.argv[2:3]))
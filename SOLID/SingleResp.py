@@ -69,19 +69,20 @@ class PersistenceManager:
         file.close()
 
 
-j = Journal()
-j.add_entry("I cried today.")
-j.add_entry("I ate a bug.")
-print(f"Journal entries:\n{j}")
-
-file = r"C:\Users\gonza\OneDrive\Documentos\MA_Shit\Udemy\journal.txt"
-PersistenceManager.save_to_file(j, file)
-"""the r in line 90 is a "raw string" and is used to make sure python does not
-understand \name.txt and a new like ame.txt, but rather like a file name.txt """
-
-# fh = file handler
-with open(file) as fh:
-    print(fh.read())
+if __name__ == "__main__":
+    j = Journal()
+    j.add_entry("I cried today.")
+    j.add_entry("I ate a bug.")
+    print(f"Journal entries:\n{j}")
+
+    file = r"C:\Users\gonza\OneDrive\Documentos\MA_Shit\Udemy\journal.txt"
+    PersistenceManager.save_to_file(j, file)
+    """the r in line 90 is a "raw string" and is used to make sure python does not
+    understand \name.txt and a new like ame.txt, but rather like a file name.txt """
+
+    # fh = file handler
+    with open(file) as fh:
+        print(fh.read())
 
 # In the output everything is printed twice, the first time is when
 # we printed them using str, and the second one is when we serialised